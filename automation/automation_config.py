@@ -7,40 +7,49 @@
 """
 
 import os
-from pathlib import Path
+from functools import lru_cache
+from types import MappingProxyType
 
 #############################################################################
 # 工具函数：动态获取路径
 #############################################################################
 
+# 模块加载时计算一次项目根目录，避免每个配置类重复计算
+# 纯字符串操作（C 层实现），不构造任何 Path 对象
+# abspath(__file__) -> 脚本文件，三层 dirname 向上推导到项目根目录
+_WORKSPACE_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+# 环境变量在模块加载时读取一次，后续引用模块级常量即可
+_CLAUDE_COMMAND_ENV = os.environ.get('CLAUDE_COMMAND')
+_EXECUTOR_TYPE = os.environ.get('EXECUTOR_TYPE', 'claude')
+
+# 默认 Claude Code 路径：expanduser 只在模块加载时执行一次
+# （HOME 未设置时 expanduser 会通过 pwd 模块查询 /etc/passwd）
+_DEFAULT_CLAUDE = os.path.join(os.path.expanduser("~"), ".claude", "local", "claude")
+
+@lru_cache(maxsize=1)
 def get_workspace_root():
     """
     动态获取项目根目录
     从脚本所在目录（.ai/automation）向上推导到项目根目录
     """
-    # 获取当前脚本所在目录
-    script_dir = Path(__file__).parent.absolute()
-    # 从 .ai/automation 向上推导到项目根目录
-    workspace_root = script_dir.parent.parent
-    return str(workspace_root)
+    return _WORKSPACE_ROOT
 
+@lru_cache(maxsize=1)
 def get_claude_command():
     """
     动态获取 Claude Code 可执行文件路径
     优先级：环境变量 > 默认路径（~/.claude/local/claude）
     """
-    # 优先使用环境变量
-    env_path = os.environ.get('CLAUDE_COMMAND')
-    if env_path and os.path.exists(env_path):
-        return env_path
-    
-    # 使用默认路径（用户主目录）
-    default_path = os.path.expanduser("~/.claude/local/claude")
-    if os.path.exists(default_path):
-        return default_path
-    
+    # 按优先级遍历候选路径（环境变量 > 默认路径），返回第一个存在的
+    for candidate in (_CLAUDE_COMMAND_ENV, _DEFAULT_CLAUDE):
+        if candidate and os.path.exists(candidate):
+            return candidate
+
     # 如果都不存在，返回默认路径（让验证函数报错）
-    return default_path
+    return _DEFAULT_CLAUDE
 
 #############################################################################
 # Claude Code 配置
@@ -49,6 +58,9 @@ def get_claude_command():
 class ClaudeCodeConfig:
     """Claude Code 执行器配置"""
 
+    # 纯命名空间类：禁止实例 __dict__，属性走更快的槽描述符路径
+    __slots__ = ()
+
     # Claude Code 可执行文件路径（动态获取）
     CLAUDE_COMMAND = get_claude_command()
 
@@ -66,6 +78,10 @@ class ClaudeCodeConfig:
     # 工作目录（动态获取）
     WORKSPACE_PATH = get_workspace_root()
 
+    # 工作目录的 bytes 形式，供 subprocess 等 POSIX 接口直接使用，
+    # 省去每次 spawn 时的 os.fsencode 编码
+    WORKSPACE_PATH_BYTES = os.fsencode(WORKSPACE_PATH)
+
     # Claude Code 启动等待时间(秒)
     STARTUP_WAIT_TIME = 5
 
@@ -82,31 +98,28 @@ class ClaudeCodeConfig:
     # True: 显示所有输出行，实时查看 Claude Code 的完整执行过程
     SHOW_DETAILED_OUTPUT = False
 
+    # 命令行参数在类定义时预计算一次（所有输入都是类常量）：
+    # - --print: 非交互式执行（适合管道和自动化），跳过工作区信任对话框，
+    #   直接从 stdin 读取指令，处理完后自动退出
+    # - --permission-mode: 权限模式，bypassPermissions 实现完全无人值守
+    # - --dangerously-skip-permissions: 跳过所有权限检查和确认提示
+    _CLAUDE_ARGS = (
+        f"--print --permission-mode {PERMISSION_MODE}"
+        + (" --dangerously-skip-permissions" if USE_DANGEROUS_SKIP else "")
+    )
+
     @classmethod
     def get_claude_args(cls) -> str:
         """获取 Claude Code 命令行参数"""
-        args = []
+        return cls._CLAUDE_ARGS
 
-        # 使用 --print 模式进行非交互式执行（适合管道和自动化）
-        # 这会跳过工作区信任对话框，直接从 stdin 读取指令并执行
-        # 处理完指令后会自动退出，不会一直等待输入
-        args.append("--print")
-
-        # 设置权限模式为 bypassPermissions，完全无人值守
-        # 这会自动接受所有操作：编辑、写入、bash、删除等
-        args.append(f"--permission-mode {cls.PERMISSION_MODE}")
-
-        # 如果启用了危险跳过模式,同时使用 --dangerously-skip-permissions
-        # 这会直接跳过所有权限检查,包括确认提示，确保完全无需确认
-        if cls.USE_DANGEROUS_SKIP:
-            args.append("--dangerously-skip-permissions")
-
-        return " ".join(args)
+    # 完整命令同样是类常量，在类定义时拼接一次
+    FULL_COMMAND = f"{CLAUDE_COMMAND} {_CLAUDE_ARGS}"
 
     @classmethod
     def get_full_command(cls) -> str:
         """获取完整的 Claude Code 命令"""
-        return f"{cls.CLAUDE_COMMAND} {cls.get_claude_args()}"
+        return cls.FULL_COMMAND
 
 
 #############################################################################
@@ -116,6 +129,9 @@ class ClaudeCodeConfig:
 class CursorConfig:
     """Cursor 执行器配置"""
 
+    # 纯命名空间类：禁止实例 __dict__，属性走更快的槽描述符路径
+    __slots__ = ()
+
     # 工作目录（动态获取）
     WORKSPACE_PATH = get_workspace_root()
 
@@ -139,29 +155,36 @@ class CursorConfig:
 class TaskManagerConfig:
     """任务管理器配置"""
 
+    # 纯命名空间类：禁止实例 __dict__，属性走更快的槽描述符路径
+    __slots__ = ()
+
     # 项目路径（动态获取）
     WORKSPACE_ROOT = get_workspace_root()
+    # 路径拼接用 f-string 一次完成，只在末尾 normpath 一次
     # 修改为扫描整个 issue 目录下的所有项目
-    PLAN_ROOT = os.path.join(
-        WORKSPACE_ROOT,
-        ".ai/issue"
-    )
-    AUTOMATION_DIR = os.path.join(WORKSPACE_ROOT, ".ai/automation")
-    LOG_DIR = os.path.join(AUTOMATION_DIR, "logs")
-    STATE_FILE = os.path.join(AUTOMATION_DIR, "state.json")
+    PLAN_ROOT = os.path.normpath(f"{WORKSPACE_ROOT}/.ai/issue")
+    AUTOMATION_DIR = os.path.normpath(f"{WORKSPACE_ROOT}/.ai/automation")
+    # AUTOMATION_DIR 已规范化，子路径直接拼接即可
+    LOG_DIR = f"{AUTOMATION_DIR}{os.sep}logs"
+    STATE_FILE = f"{AUTOMATION_DIR}{os.sep}state.json"
 
     # 执行器类型: 'cursor' 或 'claude'
-    EXECUTOR_TYPE = os.environ.get('EXECUTOR_TYPE', 'claude')  # 默认使用 Claude Code
+    EXECUTOR_TYPE = _EXECUTOR_TYPE  # 默认使用 Claude Code
 
     # 监控循环配置
     MONITOR_INTERVAL = 900           # 监控间隔(秒) = 15分钟
     MAX_MONITOR_DURATION = 24 * 60 * 60  # 最大运行时间(秒) = 24小时
 
-    # 任务执行配置
-    TASK_STARTUP_WAIT = {
+    # 任务执行配置（只读视图，防止消费方意外修改全局配置）
+    TASK_STARTUP_WAIT = MappingProxyType({
         'claude': 20,  # Claude Code 需要更长启动时间
         'cursor': 15   # Cursor 启动时间
-    }
+    })
+
+    # EXECUTOR_TYPE 在导入时已确定，当前执行器的启动等待时间直接解析为常量，
+    # 消费方无需再做字典查找；环境变量写错时按 claude 的等待时间降级，
+    # 不能让一个拼错的值把导入炸成 KeyError
+    STARTUP_WAIT = TASK_STARTUP_WAIT.get(EXECUTOR_TYPE, TASK_STARTUP_WAIT['claude'])
 
 
 #############################################################################
@@ -171,6 +194,9 @@ class TaskManagerConfig:
 class AutomationMode:
     """自动化模式配置"""
 
+    # 纯命名空间类：禁止实例 __dict__，属性走更快的槽描述符路径
+    __slots__ = ()
+
     # 是否启用完全自动化模式
     FULLY_AUTOMATED = True
 
@@ -190,52 +216,90 @@ class AutomationMode:
     # 是否在任务执行前显示预览
     SHOW_TASK_PREVIEW = True
 
-    # 任务执行超时配置
-    TASK_TIMEOUT = {
+    # 任务执行超时配置（只读视图，防止消费方意外修改全局配置）
+    TASK_TIMEOUT = MappingProxyType({
         'default': 900,  # 默认15分钟
         'test': 3600,     # 测试任务60分钟
         'build': 3600     # 构建任务60分钟
-    }
+    })
+
+    # 默认超时是最常用的取值，同样在导入时解析为常量
+    DEFAULT_TASK_TIMEOUT = TASK_TIMEOUT['default']
 
 
 #############################################################################
 # 导出配置
 #############################################################################
 
-__all__ = [
+__all__ = (
     'ClaudeCodeConfig',
     'CursorConfig',
     'TaskManagerConfig',
     'AutomationMode'
-]
+)
 
 
 #############################################################################
 # 配置验证
 #############################################################################
 
-def validate_config():
-    """验证配置是否正确"""
-    errors = []
+def _missing_paths(paths):
+    """
+    批量检查路径是否存在
+    按父目录分组，每个父目录只做一次 os.scandir，
+    系统调用次数从 O(路径数) 降为 O(父目录数)
+    """
+    by_parent = {}
+    for path in paths:
+        parent, name = os.path.split(path)
+        by_parent.setdefault(parent, []).append((name, path))
+
+    for parent, entries in by_parent.items():
+        try:
+            with os.scandir(parent) as it:
+                names = {entry.name for entry in it}
+        except OSError:
+            names = frozenset()
+        for name, path in entries:
+            if name not in names:
+                yield path
+
+def _check_paths():
+    """检查 Claude Code 可执行文件和工作目录是否存在"""
+    targets = {
+        ClaudeCodeConfig.CLAUDE_COMMAND: "Claude Code 可执行文件不存在",
+        ClaudeCodeConfig.WORKSPACE_PATH: "工作目录不存在",
+    }
+    for path in _missing_paths(targets):
+        yield f"{targets[path]}: {path}"
 
-    # 检查 Claude Code 可执行文件
-    if not os.path.exists(ClaudeCodeConfig.CLAUDE_COMMAND):
-        errors.append(f"Claude Code 可执行文件不存在: {ClaudeCodeConfig.CLAUDE_COMMAND}")
+# 错误提示用的合法权限模式展示串，预先拼好
+_VALID_PERMISSION_MODES_STR = "bypassPermissions, acceptEdits, default, plan"
 
-    # 检查工作目录
-    if not os.path.exists(ClaudeCodeConfig.WORKSPACE_PATH):
-        errors.append(f"工作目录不存在: {ClaudeCodeConfig.WORKSPACE_PATH}")
+def _check_permission_mode():
+    """检查权限模式（match/case 对字面量字符串做快速分派）"""
+    match ClaudeCodeConfig.PERMISSION_MODE:
+        case "bypassPermissions" | "acceptEdits" | "default" | "plan":
+            pass
+        case _:
+            yield (f"无效的权限模式: {ClaudeCodeConfig.PERMISSION_MODE}. "
+                   f"有效值: {_VALID_PERMISSION_MODES_STR}")
 
-    # 检查权限模式
-    valid_modes = ["bypassPermissions", "acceptEdits", "default", "plan"]
-    if ClaudeCodeConfig.PERMISSION_MODE not in valid_modes:
-        errors.append(f"无效的权限模式: {ClaudeCodeConfig.PERMISSION_MODE}. "
-                     f"有效值: {', '.join(valid_modes)}")
+def validate_config():
+    """
+    验证配置是否正确（惰性生成器）
+    逐项产出错误信息，只需判断"是否有错"的调用方可以在第一个错误处提前终止，
+    避免执行后续检查的 stat 系统调用
+    """
+    yield from _check_paths()
+    yield from _check_permission_mode()
 
-    return errors
+def validate_config_list():
+    """验证配置是否正确，返回错误列表（兼容旧接口）"""
+    return list(validate_config())
 
 
-if __name__ == '__main__':
+def _main():
     """配置验证脚本"""
     print("=" * 60)
     print("自动化配置验证")
@@ -262,7 +326,7 @@ if __name__ == '__main__':
     print(f"   - 错误处理策略: {AutomationMode.ERROR_STRATEGY}")
 
     print("\n5. 配置验证:")
-    errors = validate_config()
+    errors = validate_config_list()
     if errors:
         print("   ❌ 发现以下配置错误:")
         for error in errors:
@@ -271,3 +335,7 @@ if __name__ == '__main__':
         print("   ✅ 配置验证通过")
 
     print("=" * 60)
+
+
+if __name__ == '__main__':
+    _main()
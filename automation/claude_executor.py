@@ -9,19 +9,124 @@ Claude Code 执行器
 3. 自动发送任务指令
 """
 
+import codecs
+import mmap
 import os
+import re
+import signal
 import sys
 import time
 import subprocess
 import logging
+from collections import deque
 from datetime import datetime
 from typing import Optional
 
 # 导入配置
+try:
+    import psutil  # 可选依赖：有则进程内扫描进程表，免去 pgrep 的 fork
+except ImportError:
+    psutil = None
+
 from automation_config import ClaudeCodeConfig
 
 logger = logging.getLogger('ClaudeExecutor')
 
+# 输出日志中"代码修改迹象"的关键字，模块加载时编译成单个字节正则
+# 一次 C 层扫描代替逐关键字的多遍子串搜索，也无需整份日志转小写
+_MOD_RE = re.compile(
+    '(?i)edit|write|create|修改|创建|写入|search_replace|write_file|'
+    '已修改|已创建|已更新|updated|created|modified|changed'.encode('utf-8')
+)
+
+#############################################################################
+# AppleScript 会话
+#############################################################################
+
+class _OsascriptSession:
+    """
+    常驻 osascript 解释器会话
+    每次 AppleScript 调用都新起 osascript 要付一次 fork+execve 加上
+    ~30-60ms 的解释器冷启动；这里复用一个 `osascript -i` 交互进程，
+    脚本经 stdin 送入，以一行哨兵表达式标记结果边界
+    """
+
+    _SENTINEL = '__OSA_DONE__'
+    _ERR_MARK = '__OSA_ERR__'
+
+    def __init__(self):
+        self._proc = None
+
+    def _ensure(self):
+        """确保解释器进程存活，必要时（重新）拉起"""
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ['osascript', '-i', '-s', 's'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        return self._proc
+
+    def run(self, script, timeout=15):
+        """
+        执行一段 AppleScript，返回 (是否成功, 输出文本)
+        脚本被包装成 handler 再调用，这样顶层 return 在 REPL 里也合法；
+        调用再包一层 try：REPL 里脚本出错只会打印错误文本继续往下走，
+        必须自己打上错误标记才能和正常输出区分开
+        """
+        import select
+        try:
+            proc = self._ensure()
+            wrapped = (
+                'on __osa_run()\n' + script.strip() + '\nend __osa_run\n'
+                'try\n'
+                '__osa_run()\n'
+                'on error __osa_msg number __osa_num\n'
+                '"' + self._ERR_MARK + '" & __osa_num & ": " & __osa_msg\n'
+                'end try\n'
+                '"' + self._SENTINEL + '"\n'
+            )
+            proc.stdin.write(wrapped.encode('utf-8'))
+            proc.stdin.flush()
+
+            buf = ''
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                ready, _, _ = select.select([proc.stdout], [], [], 0.1)
+                if not ready:
+                    continue
+                chunk = os.read(proc.stdout.fileno(), 4096)
+                if not chunk:
+                    break  # 解释器意外退出
+                buf += chunk.decode('utf-8', 'replace')
+                idx = buf.find(self._SENTINEL)
+                if idx != -1:
+                    out = buf[:idx].strip().strip('"')
+                    if self._ERR_MARK in out:
+                        logger.debug(f"AppleScript 执行出错: {out}")
+                        return False, out
+                    return True, out
+            # 超时或进程退出：丢弃会话，下次调用时重建
+            self.close()
+            return False, buf.strip()
+        except Exception as e:
+            logger.debug(f"常驻 osascript 会话执行失败: {e}")
+            self.close()
+            return False, ''
+
+    def close(self):
+        """关闭解释器进程"""
+        proc, self._proc = self._proc, None
+        if proc is not None:
+            try:
+                proc.stdin.close()
+                proc.kill()
+                proc.wait(timeout=2)
+            except Exception:
+                pass
+
 #############################################################################
 # Claude Code 管理器
 #############################################################################
@@ -35,135 +140,88 @@ class ClaudeCodeManager:
         self.claude_command = ClaudeCodeConfig.CLAUDE_COMMAND
         # 使用配置文件中的权限模式,实现完全无人值守
         self.claude_args = ClaudeCodeConfig.get_claude_args()
+        # 启动路径的预计算：argv 只分词一次；检测开关快照一次，
+        # 避免每次启动重复 split + 反复查类属性
+        self._claude_argv = (self.claude_command, *self.claude_args.split())
+        self._enable_file_detection = ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION
         self.last_terminal_window_id = None  # 记录上一个终端窗口ID
         self.last_claude_pids = []  # 记录上一个窗口关联的 claude 进程 PID
-        self.last_task_pids = set()  # 记录上一个任务启动的所有进程（包括子进程）
+        self._window_pids = {}  # window_id -> 开窗时记录的 claude PID 集合
+        # 记录上一个任务的进程组 ID（start_new_session 后 pgid == 主进程 pid）
+        # 任务产生的所有子进程都继承该进程组，清理时一次 killpg 即可全部送达
+        self.last_task_pgid = None
         self.use_stdin_mode = use_stdin_mode  # 是否使用 stdin 方式（不依赖键盘或剪贴板）
+        self._osa = _OsascriptSession()  # 常驻 AppleScript 会话，省去每次调用的冷启动
         logger.info(f"Claude Code 配置: {self.claude_command} {self.claude_args}")
         logger.info(f"传输模式: {'stdin（不受屏幕锁定影响）' if use_stdin_mode else '键盘事件（可能受屏幕锁定影响）'}")
         logger.info(f"详细输出模式: {'已启用（显示所有输出）' if ClaudeCodeConfig.SHOW_DETAILED_OUTPUT else '已关闭（只显示前50行）'}")
         logger.info(f"文件修改检测: {'已启用' if ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION else '已关闭'}")
 
-    def _get_process_tree(self, root_pid):
+    def _run_applescript(self, script, timeout=15):
         """
-        获取进程树：包括指定进程及其所有子进程
+        执行 AppleScript，返回 (是否成功, 输出文本)
+        优先复用常驻 osascript 会话；会话不可用时退回一次性 osascript 进程
         """
-        pids = set([str(root_pid)])
-        
+        ok, out = self._osa.run(script, timeout=timeout)
+        if ok:
+            return True, out
+        logger.debug("常驻 osascript 会话不可用，退回一次性调用")
         try:
-            # 使用 pstree 或递归查找子进程
-            # macOS 没有 pstree，使用 ps 和 pgrep 来查找子进程
-            def find_children(parent_pid):
-                try:
-                    # 查找所有进程，检查 PPID (父进程ID)
-                    result = subprocess.run(
-                        ['ps', '-eo', 'pid,ppid'],
-                        capture_output=True,
-                        text=True
-                    )
-                    if result.returncode == 0:
-                        for line in result.stdout.strip().split('\n')[1:]:  # 跳过标题行
-                            parts = line.strip().split()
-                            if len(parts) >= 2:
-                                pid, ppid = parts[0], parts[1]
-                                if ppid == parent_pid and pid not in pids:
-                                    pids.add(pid)
-                                    # 递归查找子进程的子进程
-                                    find_children(pid)
-                except Exception as e:
-                    logger.debug(f"查找子进程失败: {e}")
-            
-            find_children(str(root_pid))
+            result = subprocess.run(
+                ['osascript', '-e', script],
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            return result.returncode == 0, result.stdout.strip()
         except Exception as e:
-            logger.debug(f"获取进程树失败: {e}")
-        
-        return pids
+            logger.warning(f"AppleScript 执行失败: {e}")
+            return False, ''
 
     def cleanup_previous_task_processes(self):
         """
-        清理上一个任务启动的进程及其所有子进程
-        只清理记录的进程，不影响其他进程
+        清理上一个任务启动的进程组（主进程及其所有子进程）
+        信号直接发给整个进程组，不影响其他进程，也不依赖轮询收集的 PID 列表
         """
         try:
-            if not self.last_task_pids:
+            pgid = self.last_task_pgid
+            if pgid is None:
                 logger.info("🧹 没有需要清理的上一个任务的进程")
                 return
-            
-            logger.info(f"🧹 清理上一个任务启动的进程: {len(self.last_task_pids)} 个进程")
-            
-            # 步骤1: 优雅关闭所有进程（SIGTERM）
-            logger.info(f"🔄 优雅关闭进程...")
-            for pid in self.last_task_pids:
+
+            logger.info(f"🧹 清理上一个任务的进程组: {pgid}")
+
+            # 步骤1: 优雅关闭整个进程组（SIGTERM）
+            try:
+                os.killpg(pgid, signal.SIGTERM)
+            except ProcessLookupError:
+                # 进程组已不存在
+                logger.info("🧹 进程组已全部退出，无需清理")
+                self.last_task_pgid = None
+                return
+
+            # 等待进程组退出：用 killpg(pgid, 0) 探测存活，最多等 2 秒
+            alive = True
+            deadline = time.monotonic() + 2.0
+            while time.monotonic() < deadline:
                 try:
-                    # 检查进程是否还存在
-                    result = subprocess.run(
-                        ['ps', '-p', pid],
-                        capture_output=True,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL
-                    )
-                    if result.returncode == 0:
-                        subprocess.run(['kill', '-15', pid], timeout=2, 
-                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                except Exception as e:
-                    logger.debug(f"关闭进程 {pid} 失败: {e}")
-            
-            # 等待进程关闭
-            time.sleep(2)
-            
-            # 步骤2: 检查并强制关闭未关闭的进程（SIGKILL）
-            remaining_pids = []
-            for pid in self.last_task_pids:
+                    os.killpg(pgid, 0)
+                except ProcessLookupError:
+                    alive = False
+                    break
+                time.sleep(0.05)
+
+            # 步骤2: 仍未退出则强制终止（SIGKILL）
+            if alive:
+                logger.warning(f"⚠️  进程组 {pgid} 未在宽限期内退出，使用 SIGKILL 强制终止...")
                 try:
-                    result = subprocess.run(
-                        ['ps', '-p', pid],
-                        capture_output=True,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL
-                    )
-                    if result.returncode == 0:
-                        remaining_pids.append(pid)
-                except Exception:
-                    pass
-            
-            if remaining_pids:
-                logger.warning(f"⚠️  还有 {len(remaining_pids)} 个进程未终止，使用 SIGKILL 强制终止...")
-                for pid in remaining_pids:
-                    try:
-                        subprocess.run(['kill', '-9', pid], timeout=2,
-                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                        logger.info(f"✅ 强制关闭进程: {pid}")
-                    except Exception as e:
-                        logger.warning(f"强制关闭进程 {pid} 失败: {e}")
-                
-                # 再次等待，确保强制终止生效
-                time.sleep(1)
-                
-                # 最终检查：确认所有进程都已终止
-                final_check_pids = []
-                for pid in remaining_pids:
-                    try:
-                        result = subprocess.run(
-                            ['ps', '-p', pid],
-                            capture_output=True,
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL
-                        )
-                        if result.returncode == 0:
-                            final_check_pids.append(pid)
-                    except Exception:
-                        pass
-                
-                if final_check_pids:
-                    logger.error(f"❌ 仍有 {len(final_check_pids)} 个进程无法终止: {final_check_pids}")
-                else:
-                    logger.info(f"✅ 所有进程已成功终止")
-            
-            total_cleaned = len(self.last_task_pids)
-            logger.info(f"✅ 已清理上一个任务的 {total_cleaned} 个进程")
-            # 清空记录
-            self.last_task_pids = set()
-                
+                    os.killpg(pgid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass  # 恰好在探测后退出
+
+            logger.info(f"✅ 已清理上一个任务的进程组 {pgid}")
+            self.last_task_pgid = None
+
         except Exception as e:
             logger.warning(f"清理进程时出错: {e}")
 
@@ -189,7 +247,7 @@ class ClaudeCodeManager:
                 end tell
                 '''
                 try:
-                    subprocess.run(['osascript', '-e', applescript_close], timeout=5)
+                    self._run_applescript(applescript_close, timeout=5)
                     logger.info("✅ 终端窗口已关闭")
                 except Exception as e:
                     logger.warning(f"关闭终端窗口失败: {e}")
@@ -201,6 +259,60 @@ class ClaudeCodeManager:
         except Exception as e:
             logger.warning(f"清理会话时出错: {e}")
 
+    def _is_git_workspace(self) -> bool:
+        """判断工作目录是否在 git 仓库内"""
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', '--is-inside-work-tree'],
+                cwd=self.workspace_path,
+                capture_output=True,
+                timeout=5
+            )
+            return result.returncode == 0 and result.stdout.strip() == b'true'
+        except Exception:
+            return False
+
+    def _git_changed_paths(self):
+        """获取 git 变更文件列表（一次 execve，NUL 分隔避免转义问题）"""
+        try:
+            result = subprocess.run(
+                ['git', 'status', '--porcelain=v1', '-z'],
+                cwd=self.workspace_path,
+                capture_output=True,
+                timeout=5
+            )
+            if result.returncode == 0:
+                return [entry.decode('utf-8', 'replace').strip()
+                        for entry in result.stdout.split(b'\0') if entry.strip()]
+        except Exception as e:
+            logger.debug(f"检查git状态失败: {e}")
+        return []
+
+    def _snapshot_java(self, workspace: str):
+        """
+        快照工作目录下所有 .java 文件的修改时间
+        基于 os.scandir 的显式栈遍历：目录/文件判断直接复用 readdir 返回的
+        dirent 类型（无额外 stat），只对 .java 文件取 DirEntry 缓存的 stat；
+        记录整数 st_mtime_ns 避免浮点比较
+        返回 dict[相对路径, st_mtime_ns]
+        """
+        snapshot = {}
+        root = workspace.rstrip(os.sep)
+        prefix_len = len(root) + 1
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith('.java') and entry.is_file(follow_symlinks=False):
+                            snapshot[entry.path[prefix_len:]] = entry.stat().st_mtime_ns
+            except OSError as e:
+                logger.debug(f"扫描目录失败 {current}: {e}")
+        return snapshot
+
     def launch_claude_with_stdin(self, task_id: str, instruction: str) -> bool:
         """
         使用 stdin 方式启动 Claude Code 并发送指令
@@ -229,8 +341,8 @@ class ClaudeCodeManager:
             logger.info(f"🚀 使用 stdin 方式启动 Claude Code: {task_id}")
             logger.info("💡 优势: 完全不受屏幕锁定影响，无需键盘或剪贴板")
 
-            # 构建 Claude 命令
-            claude_cmd = [self.claude_command] + self.claude_args.split()
+            # 命令 argv 已在 __init__ 预计算
+            claude_cmd = self._claude_argv
 
             logger.info(f"📝 命令: {' '.join(claude_cmd)}")
             logger.info(f"📂 工作目录: {self.workspace_path}")
@@ -242,55 +354,29 @@ class ClaudeCodeManager:
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
+                # 二进制管道：发送侧预编码一次，接收侧 os.read + 增量解码
                 cwd=self.workspace_path,
-                bufsize=0  # 无缓冲，确保实时输出
+                bufsize=-1,  # 默认全缓冲；指令整体写入后 flush+close 即可保证送达
+                start_new_session=True  # 独立会话/进程组，清理时 killpg 一次送达所有子进程
             )
 
             logger.info(f"✅ Claude Code 已启动 (PID: {process.pid})")
 
-            # 记录进程 PID 并开始跟踪进程树
-            main_pid = process.pid
+            # 记录进程信息；start_new_session 后进程组 ID 即主进程 PID，
+            # 所有子进程自动继承，无需后台线程轮询收集进程树
             self.active_sessions[task_id] = {
-                'pid': main_pid,
+                'pid': process.pid,
                 'process': process,
                 'start_time': datetime.now().isoformat()
             }
-            
-            # 启动后台线程定期收集进程树（包括子进程）
-            import threading
-            tracker_done = threading.Event()  # 用于标记跟踪线程完成
-            
-            def track_process_tree():
-                """定期收集进程树"""
-                try:
-                    while process.poll() is None:  # 进程还在运行
-                        # 获取进程树
-                        tree_pids = self._get_process_tree(main_pid)
-                        # 更新记录的上一个任务的进程集合
-                        self.last_task_pids.update(tree_pids)
-                        time.sleep(5)  # 每5秒检查一次
-                    # 进程退出前最后一次收集
-                    tree_pids = self._get_process_tree(main_pid)
-                    self.last_task_pids.update(tree_pids)
-                    logger.info(f"📊 任务进程跟踪完成，共记录 {len(self.last_task_pids)} 个进程")
-                    tracker_done.set()  # 标记跟踪完成
-                except Exception as e:
-                    logger.debug(f"跟踪进程树失败: {e}")
-                    tracker_done.set()  # 即使出错也标记完成
-            
-            tracker_thread = threading.Thread(target=track_process_tree, daemon=True)
-            tracker_thread.start()
-            
-            # 保存 tracker_done 事件到 session_info，以便后续等待
-            self.active_sessions[task_id]['tracker_done'] = tracker_done
+            self.last_task_pgid = process.pid
 
-            # 发送指令到 stdin
+            # 发送指令到 stdin：UTF-8 只编码一次，单次 write 写入整个负载
             logger.info("📤 发送指令到 stdin...")
             logger.info(f"📄 指令长度: {len(instruction)} 字符")
             try:
-                process.stdin.write(instruction)
-                process.stdin.write('\n')
+                payload = instruction.encode('utf-8') + b'\n'
+                process.stdin.write(payload)
                 process.stdin.flush()
                 logger.info("✅ 指令已发送")
             except Exception as e:
@@ -304,24 +390,25 @@ class ClaudeCodeManager:
             process.stdin.close()
 
             # 记录任务开始时的文件状态（用于检测文件修改）
-            import os
-            from pathlib import Path
             
-            # 根据配置决定是否启用文件修改检测
-            enable_file_detection = ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION
-            workspace_path_obj = Path(self.workspace_path)
+            # 根据配置决定是否启用文件修改检测（__init__ 时已快照）
+            enable_file_detection = self._enable_file_detection
             java_files_before = {}
-            
+
+            git_repo = False
             if enable_file_detection:
-                # 获取工作目录下所有Java文件的修改时间（用于检测代码修改）
-                try:
-                    for java_file in workspace_path_obj.rglob("*.java"):
-                        if java_file.is_file():
-                            java_files_before[str(java_file.relative_to(workspace_path_obj))] = java_file.stat().st_mtime
-                    logger.info(f"📝 记录任务开始时的文件状态: {len(java_files_before)} 个Java文件")
-                except Exception as e:
-                    logger.warning(f"⚠️  记录文件状态失败: {e}")
-                    java_files_before = {}
+                # git 仓库里 git 索引就是现成的快速变更检测器，跳过全量 Java 扫描
+                git_repo = self._is_git_workspace()
+                if git_repo:
+                    logger.info("📝 工作区是 git 仓库，变更检测交给 git status")
+                else:
+                    # 非 git 仓库才做 Java 文件修改时间快照
+                    try:
+                        java_files_before = self._snapshot_java(self.workspace_path)
+                        logger.info(f"📝 记录任务开始时的文件状态: {len(java_files_before)} 个Java文件")
+                    except Exception as e:
+                        logger.warning(f"⚠️  记录文件状态失败: {e}")
+                        java_files_before = {}
             else:
                 logger.debug("💡 文件修改检测已关闭")
             
@@ -335,176 +422,96 @@ class ClaudeCodeManager:
             os.makedirs(os.path.dirname(output_file), exist_ok=True)
             
             # 启动后台线程监控进程输出
+            import selectors
             import threading
+            # 失败摘录只引用最后 5 行，环形缓冲按需裁到 5，内存 O(1)
+            # （前 50 行的展示在读取时就已直接写入日志，无需另存头部窗口）
+            recent_lines = deque(maxlen=5)
+            # 超时路径用事件通知监控线程收尾，避免它阻塞在读上拖住进程退出
+            shutdown_event = threading.Event()
+
             def monitor_output():
-                """监控进程输出"""
+                """监控进程输出（按 64KB 块读取，整块写盘，不逐行 flush）
+                只负责把 stdout 排空到日志文件，读到 EOF 即退出；
+                等待退出码和结果分析由 wait_for_task_completion 负责
+                """
                 # 在函数内部重新获取配置，确保可以访问
-                enable_file_detection = ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION
                 show_detailed_output = ClaudeCodeConfig.SHOW_DETAILED_OUTPUT
-                output_lines = []
-                return_code = None
-                full_output = ""
+                # INFO 被关掉时整个展示分支直接跳过，不做任何格式化
+                info_enabled = logger.isEnabledFor(logging.INFO)
+                line_count = 0
                 first_output_received = False
-                
+
                 try:
-                    # 先等待一下，给进程时间启动
-                    time.sleep(2)
-                    
-                    # 如果进程已经退出，直接读取剩余输出
-                    if process.poll() is not None:
-                        remaining = process.stdout.read()
-                        if remaining:
-                            with open(output_file, 'w', encoding='utf-8') as f:
-                                for line in remaining.splitlines(True):
-                                    if line.strip():
-                                        output_lines.append(line.strip())
-                                        full_output += line
-                                        f.write(line)
-                                        f.flush()
-                                        
-                                        if not first_output_received:
-                                            first_output_received = True
-                                            logger.info("✅ Claude Code 已开始输出")
-                                        
-                                        if show_detailed_output:
-                                            logger.info(f"📊 Claude Code 输出: {line.strip()[:200]}")
-                                        else:
-                                            if len(output_lines) <= 50:
-                                                logger.info(f"📊 Claude Code 输出 [{len(output_lines)}]: {line.strip()[:200]}")
-                                            elif len(output_lines) == 51:
-                                                logger.info("📊 ... (更多输出已省略，完整输出已保存到文件)")
-                    else:
-                        # 进程还在运行，实时读取输出
-                        logger.info("⏳ Claude Code 正在处理中，等待输出...")
-                        logger.info(f"💡 完整输出将实时保存到: {output_file}")
-                        
-                        # 读取所有输出并保存到文件
-                        with open(output_file, 'w', encoding='utf-8') as f:
-                            for i, line in enumerate(process.stdout):
-                                if line:
-                                    output_lines.append(line.strip())
-                                    full_output += line
-                                    f.write(line)
-                                    f.flush()  # 实时写入文件
-                                    
-                                    if not first_output_received:
-                                        first_output_received = True
-                                        logger.info("✅ Claude Code 已开始输出")
-                                    
-                                    # 根据配置决定是否显示详细输出
-                                    if show_detailed_output:
-                                        # 显示所有输出行
-                                        logger.info(f"📊 Claude Code 输出 [{i+1}]: {line.strip()[:200]}")
-                                    else:
-                                        # 只显示前50行输出
-                                        if i < 50:
-                                            logger.info(f"📊 Claude Code 输出 [{i+1}]: {line.strip()[:200]}")
-                                        elif i == 50:
-                                            logger.info("📊 ... (更多输出已省略，完整输出已保存到文件)")
-                    
+                    logger.info("⏳ Claude Code 正在处理中，等待输出...")
+                    logger.info(f"💡 完整输出将实时保存到: {output_file}")
+
+                    fd = process.stdout.fileno()
+                    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+                    pending = ''  # 未凑满一行的残余文本
+                    # selectors + 1 秒超时：Claude 停止输出时线程不会永久阻塞，
+                    # 每轮都能检查 shutdown_event 响应主线程的取消
+                    sel = selectors.DefaultSelector()
+                    sel.register(process.stdout, selectors.EVENT_READ)
+                    with sel, open(output_file, 'wb', buffering=1 << 16) as f:
+                        while not shutdown_event.is_set():
+                            if not sel.select(timeout=1.0):
+                                continue
+                            buf = os.read(fd, 65536)
+                            if not buf:
+                                break
+                            f.write(buf)
+
+                            if not first_output_received:
+                                first_output_received = True
+                                logger.info("✅ Claude Code 已开始输出")
+
+                            # 行切分只服务于终端展示和失败摘录
+                            pending += decoder.decode(buf)
+                            lines = pending.split('\n')
+                            pending = lines.pop()
+                            for line in lines:
+                                line = line.strip()
+                                if not line:
+                                    continue
+                                line_count += 1
+                                recent_lines.append(line)
+
+                                # 根据配置决定是否显示详细输出
+                                # %-style 惰性格式化：截断和拼接推迟到 logging 框架内部
+                                if info_enabled:
+                                    if show_detailed_output or line_count <= 50:
+                                        logger.info("📊 Claude Code 输出 [%d]: %.200s", line_count, line)
+                                    elif line_count == 51:
+                                        logger.info("📊 ... (更多输出已省略，完整输出已保存到文件)")
+
+                        # 补上最后一段不带换行符的输出
+                        tail = (pending + decoder.decode(b'', True)).strip()
+                        if tail:
+                            line_count += 1
+                            recent_lines.append(tail)
+
                     logger.info(f"📄 完整输出已保存到: {output_file}")
-                    
-                    # 等待进程完成（如果还没有退出）
-                    # 当 stdout 关闭时，进程可能已经退出，wait() 会立即返回
-                    return_code = process.wait()
-                    
+
                 except Exception as e:
-                    # 如果读取输出时出错，尝试获取退出码
+                    # stdout 读取失败不影响任务本身，退出码由 wait_for_task_completion 获取
                     logger.warning(f"⚠️  读取输出时出错: {e}")
-                    try:
-                        return_code = process.poll()
-                        if return_code is None:
-                            # 进程还在运行，等待它退出
-                            return_code = process.wait()
-                    except Exception as wait_error:
-                        logger.warning(f"⚠️  获取进程退出码失败: {wait_error}")
-                        return_code = -1
-                
-                # 记录进程退出状态
-                if return_code is not None:
-                    logger.info(f"📊 Claude Code 进程已退出，退出码: {return_code}")
-                    if return_code == 0:
-                        logger.info("✅ Claude Code 任务执行成功")
-                        
-                        # 只有在启用文件修改检测时才执行检测逻辑
-                        if enable_file_detection:
-                            # 方法1: 检查输出中是否有代码修改的迹象
-                            output_has_modification = False
-                            if output_lines:
-                                output_text = "\n".join(output_lines).lower()
-                                modification_keywords = [
-                                    "edit", "write", "create", "修改", "创建", "写入", 
-                                    "search_replace", "write_file", "已修改", "已创建",
-                                    "已更新", "updated", "created", "modified", "changed"
-                                ]
-                                if any(keyword in output_text for keyword in modification_keywords):
-                                    output_has_modification = True
-                                    logger.info("✅ 输出中检测到代码修改相关关键字")
-                            
-                            # 方法2: 检查实际文件是否被修改（更可靠）
-                            files_modified = []
-                            try:
-                                for java_file_path, mtime_before in java_files_before.items():
-                                    java_file = workspace_path_obj / java_file_path
-                                    if java_file.exists():
-                                        mtime_after = java_file.stat().st_mtime
-                                        if mtime_after > mtime_before:
-                                            files_modified.append(java_file_path)
-                            except Exception as e:
-                                logger.warning(f"⚠️  检查文件修改时间失败: {e}")
-                            
-                            # 方法3: 检查git状态（如果有git仓库）
-                            git_changes = []
-                            try:
-                                git_result = subprocess.run(
-                                    ['git', 'status', '--porcelain'],
-                                    cwd=self.workspace_path,
-                                    capture_output=True,
-                                    text=True,
-                                    timeout=5
-                                )
-                                if git_result.returncode == 0:
-                                    git_changes = [line.strip() for line in git_result.stdout.strip().split('\n') if line.strip()]
-                            except Exception as e:
-                                logger.debug(f"检查git状态失败（可能不是git仓库）: {e}")
-                            
-                            # 综合判断
-                            if files_modified:
-                                logger.info(f"✅ 检测到 {len(files_modified)} 个文件被修改:")
-                                for f in files_modified[:10]:  # 只显示前10个
-                                    logger.info(f"   - {f}")
-                                if len(files_modified) > 10:
-                                    logger.info(f"   ... 还有 {len(files_modified) - 10} 个文件")
-                            elif git_changes:
-                                logger.info(f"✅ Git检测到 {len(git_changes)} 个文件变更:")
-                                for change in git_changes[:10]:
-                                    logger.info(f"   - {change}")
-                                if len(git_changes) > 10:
-                                    logger.info(f"   ... 还有 {len(git_changes) - 10} 个变更")
-                            elif output_has_modification:
-                                logger.info("✅ 输出中检测到修改迹象，但未检测到实际文件修改")
-                                logger.warning("⚠️  建议检查输出文件确认是否真的执行了代码修改")
-                            else:
-                                logger.warning("⚠️  未检测到代码修改操作")
-                                logger.warning(f"⚠️  请检查输出文件: {output_file}")
-                                logger.warning("⚠️  可能的原因:")
-                                logger.warning("   1. Claude Code 只输出了对话内容，未实际执行工具调用")
-                                logger.warning("   2. 任务指令不够明确，Claude Code 没有理解需要修改代码")
-                                logger.warning("   3. --print 模式可能不支持实际执行代码修改")
-                    else:
-                        logger.warning(f"⚠️  Claude Code 任务执行异常，退出码: {return_code}")
-                        # 输出错误信息
-                        if output_lines:
-                            logger.warning(f"⚠️  最后几行输出: {output_lines[-5:]}")
-                        logger.warning(f"⚠️  完整输出已保存到: {output_file}")
-                else:
-                    logger.warning("⚠️  无法获取进程退出码")
-            
+
             # 启动监控线程（不阻塞主线程）
-            monitor_thread = threading.Thread(target=monitor_output, daemon=False)  # 改为非 daemon，确保线程完成
+            # daemon=True：父进程收到 SIGTERM 时不会被孤儿监控线程拖住
+            monitor_thread = threading.Thread(target=monitor_output, daemon=True)
             monitor_thread.start()
             logger.info("✅ 已启动输出监控线程")
 
+            # 保存任务上下文，供 wait_for_task_completion 做结果分析
+            session_info = self.active_sessions[task_id]
+            session_info['monitor_thread'] = monitor_thread
+            session_info['shutdown_event'] = shutdown_event
+            session_info['output_file'] = output_file
+            session_info['recent_lines'] = recent_lines
+            session_info['java_files_before'] = java_files_before
+            session_info['git_repo'] = git_repo
+
             logger.info("✅ stdin 方式执行成功")
             logger.info("💡 Claude Code 正在处理指令（--print 模式，完成后会自动退出）...")
             logger.info("💡 监控线程将等待任务完成...")
@@ -542,34 +549,128 @@ class ClaudeCodeManager:
         
         try:
             logger.info(f"⏳ 等待任务 {task_id} 完成（最多等待 {timeout} 秒）...")
-            # 等待进程完成，设置超时
+            # 等待进程完成，设置超时（wait 的所有权在这里，监控线程只排空输出）
             process.wait(timeout=timeout)
             return_code = process.returncode
-            
-            # 等待进程跟踪线程完成最后一次收集（最多等待5秒）
-            tracker_done = session_info.get('tracker_done')
-            if tracker_done:
-                logger.info("⏳ 等待进程跟踪线程完成最后一次收集...")
-                tracker_done.wait(timeout=5)
-                logger.info(f"📊 进程跟踪完成，共记录 {len(self.last_task_pids)} 个进程")
-            
+
+            # 进程已退出：及时关闭 stdout 管道并回收监控线程
+            self._finish_monitor(session_info, process)
+
+            logger.info(f"📊 Claude Code 进程已退出，退出码: {return_code}")
             if return_code == 0:
                 logger.info(f"✅ 任务 {task_id} 执行成功")
+                self._analyze_task_result(session_info)
                 return True
             else:
                 logger.warning(f"⚠️  任务 {task_id} 执行异常，退出码: {return_code}")
+                recent_lines = session_info.get('recent_lines')
+                if recent_lines:
+                    logger.warning(f"⚠️  最后几行输出: {list(recent_lines)}")
+                logger.warning(f"⚠️  完整输出已保存到: {session_info.get('output_file')}")
                 return False
         except subprocess.TimeoutExpired:
             logger.warning(f"⚠️  任务 {task_id} 执行超时（已等待 {timeout} 秒）")
-            # 即使超时，也尝试等待进程跟踪线程完成
-            tracker_done = session_info.get('tracker_done')
-            if tracker_done:
-                tracker_done.wait(timeout=2)
+            # 进程还活着，等不到 EOF：置事件让监控线程尽快收尾，
+            # 随后的 cleanup 才能干净地杀掉整个进程组
+            self._finish_monitor(session_info, process, drain=False)
             return False
         except Exception as e:
             logger.error(f"❌ 等待任务完成时出错: {e}")
             return False
 
+    def _finish_monitor(self, session_info, process, drain=True):
+        """回收监控线程并关闭 stdout 管道，确保 fd 及时释放
+
+        drain=True（正常退出）：进程已死，先让线程把管道读到 EOF 再
+        收，提前置 shutdown_event 会让线程在还有残余输出时就退出，
+        输出日志的结尾（往往是任务的最终结果）被截断；
+        drain=False（超时路径）：进程还活着没有 EOF 可等，只能置事件
+        让线程尽快退出
+        """
+        shutdown_event = session_info.get('shutdown_event')
+        monitor_thread = session_info.get('monitor_thread')
+        if not drain and shutdown_event:
+            shutdown_event.set()
+        if monitor_thread:
+            monitor_thread.join(timeout=5 if drain else 2)
+            if monitor_thread.is_alive() and shutdown_event:
+                # 排空超时兜底：别让收尾永远等下去
+                shutdown_event.set()
+                monitor_thread.join(timeout=2)
+        try:
+            if process.stdout:
+                process.stdout.close()
+        except Exception as e:
+            logger.debug(f"关闭 stdout 失败: {e}")
+
+    def _analyze_task_result(self, session_info):
+        """任务成功退出后检测本次任务是否真的修改了代码"""
+        # 只有在启用文件修改检测时才执行检测逻辑
+        if not ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION:
+            return
+
+        output_file = session_info.get('output_file')
+
+        # git 仓库：git status 是唯一检测器，无需文件快照和输出扫描
+        if session_info.get('git_repo'):
+            git_changes = self._git_changed_paths()
+            if git_changes:
+                logger.info(f"✅ Git检测到 {len(git_changes)} 个文件变更:")
+                for change in git_changes[:10]:
+                    logger.info(f"   - {change}")
+                if len(git_changes) > 10:
+                    logger.info(f"   ... 还有 {len(git_changes) - 10} 个变更")
+            else:
+                logger.warning("⚠️  未检测到代码修改操作")
+                logger.warning(f"⚠️  请检查输出文件: {output_file}")
+            return
+
+        # 非 git 仓库：退回快照对比 + 输出关键字扫描
+        java_files_before = session_info.get('java_files_before') or {}
+
+        # 方法1: 重新扫描一次并对比前后快照（更可靠）
+        files_modified = []
+        try:
+            if java_files_before:
+                java_files_after = self._snapshot_java(self.workspace_path)
+                files_modified = [
+                    path for path, mtime_before in java_files_before.items()
+                    if java_files_after.get(path, mtime_before) > mtime_before
+                ]
+        except Exception as e:
+            logger.warning(f"⚠️  检查文件修改时间失败: {e}")
+
+        if files_modified:
+            logger.info(f"✅ 检测到 {len(files_modified)} 个文件被修改:")
+            for path in files_modified[:10]:  # 只显示前10个
+                logger.info(f"   - {path}")
+            if len(files_modified) > 10:
+                logger.info(f"   ... 还有 {len(files_modified) - 10} 个文件")
+            return
+
+        # 方法2: 检查输出中是否有代码修改的迹象
+        # mmap 磁盘日志后跑预编译正则，单遍扫描、零拷贝
+        output_has_modification = False
+        try:
+            with open(output_file, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    output_has_modification = _MOD_RE.search(mm) is not None
+        except ValueError:
+            pass  # 空日志文件无法 mmap
+        except Exception as e:
+            logger.debug(f"扫描输出日志失败: {e}")
+
+        if output_has_modification:
+            logger.info("✅ 输出中检测到修改迹象，但未检测到实际文件修改")
+            logger.warning("⚠️  建议检查输出文件确认是否真的执行了代码修改")
+        else:
+            logger.warning("⚠️  未检测到代码修改操作")
+            logger.warning(f"⚠️  请检查输出文件: {output_file}")
+            logger.warning("⚠️  可能的原因:")
+            logger.warning("   1. Claude Code 只输出了对话内容，未实际执行工具调用")
+            logger.warning("   2. 任务指令不够明确，Claude Code 没有理解需要修改代码")
+            logger.warning("   3. --print 模式可能不支持实际执行代码修改")
+
     def launch_claude_interactive(self, task_id: str, instruction: str) -> bool:
         """
         在新终端中启动 Claude Code（交互式方式）
@@ -590,8 +691,13 @@ class ClaudeCodeManager:
             
             if old_window_id:
                 logger.info(f"📝 发现旧窗口ID: {old_window_id}")
-                # 在新窗口打开之前，获取所有 claude 进程（这些应该是旧窗口的进程）
-                old_claude_pids = self._get_claude_pids()
+                # 优先用开窗时记录的 PID 集合，省去关闭路径上的一次全表扫描
+                recorded = self._window_pids.pop(old_window_id, None)
+                if recorded:
+                    old_claude_pids = sorted(recorded)
+                else:
+                    # 没有记录（例如本进程重启后遗留的窗口）才退回全表扫描
+                    old_claude_pids = self._get_claude_pids()
                 if old_claude_pids:
                     logger.info(f"📝 旧窗口关联的 claude 进程: {old_claude_pids}")
                 else:
@@ -609,6 +715,9 @@ class ClaudeCodeManager:
                 # 等待一下，确保窗口完全关闭
                 time.sleep(1)
 
+            # 开窗前快照现有 claude 进程，开窗后取差集即本窗口的进程
+            pre_spawn_pids = set(self._get_claude_pids())
+
             # 步骤3: 打开新终端并启动 claude，获取窗口ID
             applescript = f'''
             tell application "Terminal"
@@ -619,16 +728,12 @@ class ClaudeCodeManager:
             '''
 
             logger.info("🖥️  正在打开新终端窗口并启动 Claude Code...")
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
+            ok, osa_output = self._run_applescript(applescript, timeout=15)
 
-            if result.returncode == 0:
-                # 保存新窗口的ID
-                new_window_id = result.stdout.strip()
+            if ok:
+                # 保存新窗口的ID（会话模式的输出可能带格式，只取其中的数字）
+                id_match = re.search(r'\d+', osa_output)
+                new_window_id = id_match.group(0) if id_match else ''
                 if new_window_id:
                     self.last_terminal_window_id = new_window_id
                     logger.info(f"✅ 新终端窗口已打开 (新窗口ID: {new_window_id})")
@@ -638,7 +743,17 @@ class ClaudeCodeManager:
                 logger.info("💡 等待 Claude Code 启动完成 (15秒)...")
                 time.sleep(15)  # 增加等待时间，确保 Claude Code 完全启动并准备好接收输入
 
-                # 步骤4: 将指令保存到临时文件（备用方案）
+                # 记录本窗口新增的 claude 进程，下次关窗直接复用，
+                # 关闭路径从此不需要再跑 pgrep
+                if new_window_id:
+                    spawned = set(self._get_claude_pids()) - pre_spawn_pids
+                    self._window_pids[new_window_id] = spawned
+                    if spawned:
+                        logger.debug(f"📝 新窗口 {new_window_id} 关联的 claude 进程: {sorted(spawned)}")
+
+                # 步骤4: 将指令写入临时文件，由终端内的 cat 直接注入 pty
+                # 不经过剪贴板：省去 pbcopy/pbpaste 两次 fork+execve 和两次全量拷贝，
+                # 也不会破坏用户当前剪贴板内容
                 import tempfile
                 temp_file = None
                 try:
@@ -648,40 +763,11 @@ class ClaudeCodeManager:
                     logger.info(f"📝 指令已保存到临时文件: {temp_file.name}")
                 except Exception as e:
                     logger.warning(f"保存临时文件失败: {e}")
+                    return False
 
-                # 步骤5: 在粘贴之前将指令复制到剪贴板（确保内容正确）
-                logger.info("📋 将指令复制到剪贴板...")
-                try:
-                    p = subprocess.Popen(['pbcopy'], stdin=subprocess.PIPE)
-                    p.communicate(instruction.encode('utf-8'))
-                    p.wait()  # 等待复制完成
-                    
-                    # 验证剪贴板内容
-                    verify_result = subprocess.run(
-                        ['pbpaste'],
-                        capture_output=True,
-                        text=True,
-                        timeout=2
-                    )
-                    if verify_result.returncode == 0:
-                        clipboard_content = verify_result.stdout
-                        # 检查剪贴板内容是否匹配（至少前200字符）
-                        check_len = min(200, len(instruction), len(clipboard_content))
-                        if instruction[:check_len] == clipboard_content[:check_len]:
-                            logger.info(f"✅ 剪贴板内容验证通过 ({len(clipboard_content)} 字符)")
-                        else:
-                            logger.warning("⚠️  剪贴板内容可能不正确，但继续执行")
-                            logger.debug(f"期望前100字符: {instruction[:100]}")
-                            logger.debug(f"实际前100字符: {clipboard_content[:100]}")
-                    else:
-                        logger.warning("⚠️  无法验证剪贴板内容")
-                except Exception as e:
-                    logger.warning(f"剪贴板操作失败: {e}")
+                # 步骤5: 激活终端窗口，在窗口内 cat 指令文件并回车发送
+                logger.info("⌨️  激活终端窗口并注入指令...")
 
-                # 步骤6: 激活终端窗口并粘贴指令（使用改进的方法）
-                logger.info("⌨️  激活终端窗口并粘贴指令...")
-                
-                # 使用更可靠的 AppleScript 粘贴方法
                 applescript_paste = f'''
                 tell application "Terminal"
                     activate
@@ -689,41 +775,28 @@ class ClaudeCodeManager:
                     try
                         set front window to window id {new_window_id}
                     end try
+                    -- 将指令文件内容直接写入该窗口的 pty
+                    do script "cat {temp_file.name}" in window id {new_window_id}
                 end tell
                 delay 1.5
                 tell application "System Events"
-                    -- 确保 Terminal 进程处于活动状态
-                    set terminalProcess to first application process whose name is "Terminal"
-                    set frontmost of terminalProcess to true
-                    delay 0.5
-                    -- 粘贴指令（使用 Command+V）
-                    keystroke "v" using command down
-                    delay 2.0
-                    -- 按回车发送
+                    -- 回车发送
                     key code 36
                 end tell
                 '''
-                
-                paste_result = subprocess.run(
-                    ['osascript', '-e', applescript_paste],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
-
-                if paste_result.returncode == 0:
-                    logger.info("✅ 指令已粘贴并发送")
-                    logger.info(f"💡 如果 Claude Code 显示 '[Pasted text...]'，请检查临时文件: {temp_file.name if temp_file else 'N/A'}")
+
+                paste_ok, paste_output = self._run_applescript(applescript_paste, timeout=15)
+
+                if paste_ok:
+                    logger.info("✅ 指令已注入并发送")
+                    logger.info(f"💡 如果 Claude Code 显示 '[Pasted text...]'，请检查临时文件: {temp_file.name}")
                 else:
-                    logger.error(f"⚠️  粘贴指令失败: {paste_result.stderr}")
-                    if temp_file:
-                        logger.info(f"💡 请手动读取文件并粘贴: {temp_file.name}")
-                    else:
-                        logger.info("💡 请手动粘贴指令 (Cmd+V)")
+                    logger.error(f"⚠️  注入指令失败: {paste_output}")
+                    logger.info(f"💡 请手动读取文件并粘贴: {temp_file.name}")
 
                 return True
             else:
-                logger.error(f"❌ AppleScript 执行失败: {result.stderr}")
+                logger.error(f"❌ AppleScript 执行失败: {osa_output}")
                 return False
 
         except Exception as e:
@@ -732,10 +805,123 @@ class ClaudeCodeManager:
             logger.error(traceback.format_exc())
             return False
 
+    def _signal_pids(self, pids, sig):
+        """
+        向一组进程发信号，按进程组批量发送
+        同一 Terminal 标签页里启动的 claude 进程共享进程组，
+        一次 killpg 即可送达整组；查组失败的 PID 退回逐个 os.kill
+        """
+        leftovers = []
+        pgid_members = {}
+        for pid in pids:
+            try:
+                pgid_members.setdefault(os.getpgid(int(pid)), []).append(int(pid))
+            except (ProcessLookupError, ValueError):
+                continue  # 已退出（或 PID 非法）
+            except Exception:
+                leftovers.append(pid)
+        for pgid, members in pgid_members.items():
+            try:
+                os.killpg(pgid, sig)
+                logger.debug(f"  - 已发送信号 {sig} 到进程组 {pgid} ({len(members)} 个进程)")
+            except ProcessLookupError:
+                pass
+            except Exception as e:
+                logger.debug(f"  - killpg {pgid} 失败，退回逐个发送: {e}")
+                leftovers.extend(members)
+        for pid in leftovers:
+            try:
+                os.kill(int(pid), sig)
+                logger.debug(f"  - 已发送信号 {sig} 到进程 {pid}")
+            except ProcessLookupError:
+                logger.debug(f"  - 进程 {pid} 已退出")
+            except Exception as e:
+                logger.warning(f"  - 向进程 {pid} 发送信号失败: {e}")
+
+    def _wait_pids_exit(self, pids, timeout):
+        """
+        等待一组进程退出，返回超时后仍存活的 PID 列表
+        macOS 上用 kqueue 的 EVFILT_PROC/NOTE_EXIT 事件：进程一退出立即唤醒，
+        不用睡满固定时长，也不用再 fork 一次 pgrep 复查存活
+        注册失败（进程已退出/无权限）或平台不支持 kqueue 时退回 os.kill 轮询
+        """
+        import select as _select
+        pending = {}
+        for pid in pids:
+            try:
+                pending[int(pid)] = pid
+            except (TypeError, ValueError):
+                pass
+        if not pending:
+            return []
+
+        if hasattr(_select, 'kqueue'):
+            kq = None
+            try:
+                kq = _select.kqueue()
+                watched = []
+                for pid_int in list(pending):
+                    try:
+                        kq.control([_select.kevent(
+                            pid_int,
+                            filter=_select.KQ_FILTER_PROC,
+                            flags=_select.KQ_EV_ADD | _select.KQ_EV_ENABLE,
+                            fflags=_select.KQ_NOTE_EXIT
+                        )], 0)
+                        watched.append(pid_int)
+                    except OSError:
+                        # 注册失败：多半已退出，立即用信号 0 复核一次
+                        try:
+                            os.kill(pid_int, 0)
+                        except ProcessLookupError:
+                            del pending[pid_int]
+                if watched:
+                    deadline = time.monotonic() + timeout
+                    while pending and any(p in pending for p in watched):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        for event in kq.control([], len(watched), remaining):
+                            pending.pop(event.ident, None)
+                return list(pending.values())
+            except OSError as e:
+                logger.debug(f"kqueue 等待失败，退回轮询: {e}")
+            finally:
+                if kq is not None:
+                    kq.close()
+
+        # 退路：按 50ms 间隔轮询 os.kill(pid, 0)
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            for pid_int in list(pending):
+                try:
+                    os.kill(pid_int, 0)
+                except ProcessLookupError:
+                    del pending[pid_int]
+            if pending:
+                time.sleep(0.05)
+        return list(pending.values())
+
     def _get_claude_pids(self):
         """
-        获取当前所有 claude 进程的 PID
+        获取当前所有 claude 进程的 PID（int 列表）
+        优先用 psutil 在进程内扫描进程表，语义对齐 pgrep -f（匹配完整命令行）；
+        未安装 psutil 时退回 pgrep
         """
+        if psutil is not None:
+            pids = []
+            try:
+                for proc in psutil.process_iter(['name', 'cmdline']):
+                    try:
+                        if 'claude' in (proc.info['name'] or '') or \
+                                any('claude' in arg for arg in (proc.info['cmdline'] or [])):
+                            pids.append(proc.pid)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        continue
+                return pids
+            except Exception as e:
+                logger.debug(f"psutil 扫描进程失败，退回 pgrep: {e}")
+
         try:
             result = subprocess.run(
                 ['pgrep', '-f', 'claude'],
@@ -744,7 +930,7 @@ class ClaudeCodeManager:
             )
 
             if result.returncode == 0 and result.stdout.strip():
-                return result.stdout.strip().split('\n')
+                return [int(pid) for pid in result.stdout.split()]
             return []
 
         except Exception as e:
@@ -775,193 +961,101 @@ class ClaudeCodeManager:
             # 步骤1: Kill 掉旧窗口的 claude 进程
             if old_pids:
                 logger.info(f"🔄 终止旧窗口的 claude 进程: {old_pids}")
-                for pid in old_pids:
-                    try:
-                        # 先尝试 SIGTERM (15)
-                        subprocess.run(['kill', '-15', pid], timeout=2)
-                        logger.debug(f"  - 已发送 SIGTERM 到进程 {pid}")
-                    except Exception as e:
-                        logger.warning(f"  - 终止进程 {pid} 失败: {e}")
+                # 先尝试 SIGTERM，按进程组批量发送
+                self._signal_pids(old_pids, signal.SIGTERM)
 
-                # 等待进程终止
-                logger.debug("⏳ 等待 1 秒让进程完全终止...")
-                time.sleep(1)
-
-                # 检查是否还有进程存活
-                current_pids = self._get_claude_pids()
-                remaining_pids = [pid for pid in old_pids if pid in current_pids]
+                # 事件驱动等待进程退出：进程死得快就立即继续，不用睡满 1 秒，
+                # 超时后剩下的就是存活者，无需再扫一遍
+                logger.debug("⏳ 等待进程退出（最多 1 秒）...")
+                remaining_pids = self._wait_pids_exit(old_pids, timeout=1.0)
 
                 if remaining_pids:
                     logger.warning(f"⚠️  还有 {len(remaining_pids)} 个进程未终止，使用 SIGKILL 强制终止...")
-                    for pid in remaining_pids:
-                        try:
-                            subprocess.run(['kill', '-9', pid], timeout=2)
-                            logger.debug(f"  - 已发送 SIGKILL 到进程 {pid}")
-                        except Exception as e:
-                            logger.warning(f"  - 强制终止进程 {pid} 失败: {e}")
+                    self._signal_pids(remaining_pids, signal.SIGKILL)
 
-                    time.sleep(0.5)
+                    # SIGKILL 后同样走事件驱动等待：进程一消失立即返回，
+                    # 不再无条件睡满 500ms
+                    self._wait_pids_exit(remaining_pids, timeout=0.5)
 
                 logger.info("✅ 旧窗口的 claude 进程已终止")
             else:
                 logger.debug("没有需要终止的 claude 进程")
 
-            # 步骤2: 尝试多种方法关闭窗口
-            success = False
-            
-            # 方法1: 通过窗口ID关闭 (当前使用的方法)
-            if window_id and not success:
-                logger.debug(f"🔹 方法1: 通过窗口ID关闭窗口 (ID: {window_id})...")
-                success = self._close_window_by_id(window_id)
-                if success:
-                    logger.info(f"✅ 方法1成功: 窗口已关闭 (ID: {window_id})")
-            
-            # 方法2: 通过进程查找窗口并关闭 (遍历所有窗口，查找包含 claude 进程的窗口)
-            if not success:
-                logger.debug("🔹 方法2: 通过进程查找窗口并关闭...")
-                success = self._close_window_by_process(old_pids)
-                if success:
-                    logger.info("✅ 方法2成功: 通过进程找到并关闭了窗口")
-            
-            # 方法3: 通过窗口标题查找并关闭 (查找包含 "claude" 的窗口)
-            if not success:
-                logger.debug("🔹 方法3: 通过窗口标题查找并关闭...")
-                success = self._close_window_by_title("claude")
-                if success:
-                    logger.info("✅ 方法3成功: 通过标题找到并关闭了窗口")
-            
-            # 方法4: 使用键盘快捷键关闭 (Cmd+W) - 关闭最前面的终端窗口
-            if not success:
-                logger.debug("🔹 方法4: 使用键盘快捷键关闭窗口 (Cmd+W)...")
-                success = self._close_window_by_shortcut()
-                if success:
-                    logger.info("✅ 方法4成功: 使用快捷键关闭了窗口")
-            
-            if not success:
+            # 步骤2: 四种关闭方法合并成一段 AppleScript，单次调用内部短路
+            method = self._close_window_combined(window_id, "claude")
+            if method == "id":
+                logger.info(f"✅ 方法1成功: 窗口已关闭 (ID: {window_id})")
+            elif method == "process":
+                logger.info("✅ 方法2成功: 通过进程找到并关闭了窗口")
+            elif method == "title":
+                logger.info("✅ 方法3成功: 通过标题找到并关闭了窗口")
+            elif method == "shortcut":
+                logger.info("✅ 方法4成功: 使用快捷键关闭了窗口")
+            else:
                 logger.warning("⚠️  所有关闭窗口的方法都失败了，窗口可能已经关闭或不存在")
 
         except Exception as e:
             logger.warning(f"关闭终端窗口时出错: {e}")
     
-    def _close_window_by_id(self, window_id: str) -> bool:
-        """方法1: 通过窗口ID关闭窗口"""
+    def _close_window_combined(self, window_id: str, keyword: str) -> str:
+        """
+        一段 AppleScript 内依次尝试四种关闭方法，命中即短路返回标记
+        之前每种方法各起一个 osascript，最坏要付 4 次解释器冷启动；
+        合并后窗口列表也只遍历一遍（进程匹配和标题匹配在同一轮循环里）
+
+        返回: "id" / "process" / "title" / "shortcut"，全部失败返回 ""
+        """
         try:
-            applescript = f'''
-            tell application "Terminal"
+            # 方法1: 按窗口ID关闭（仅当有窗口ID时包含这一段）
+            by_id_part = ''
+            if window_id:
+                by_id_part = f'''
                 try
                     close window id {window_id} saving no
-                    return true
-                on error
-                    return false
+                    return "id"
                 end try
-            end tell
-            '''
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0 and result.stdout.strip() == "true"
-        except Exception as e:
-            logger.debug(f"方法1失败: {e}")
-            return False
-    
-    def _close_window_by_process(self, pids: list) -> bool:
-        """方法2: 通过进程查找窗口并关闭 (遍历所有窗口，查找包含 claude 进程的窗口)"""
-        try:
+'''
             # 注意：AppleScript 的 processes 返回的是进程名称列表，不是PID
-            # 所以我们查找包含 "claude" 的进程名称
-            applescript = '''
-            tell application "Terminal"
-                set windowList to every window
-                repeat with aWindow in windowList
-                    try
-                        set tabList to every tab of aWindow
-                        repeat with aTab in tabList
-                            try
-                                set tabProcesses to processes of aTab
-                                -- 检查是否有 claude 进程
-                                repeat with aProcess in tabProcesses
-                                    if aProcess contains "claude" then
-                                        close aWindow saving no
-                                        return true
-                                    end if
-                                end repeat
-                            end try
-                        end repeat
-                    end try
-                end repeat
-                return false
-            end tell
-            '''
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0 and result.stdout.strip() == "true"
-        except Exception as e:
-            logger.debug(f"方法2失败: {e}")
-            return False
-    
-    def _close_window_by_title(self, keyword: str) -> bool:
-        """方法3: 通过窗口标题查找并关闭 (查找包含关键字的窗口)"""
-        try:
             applescript = f'''
             tell application "Terminal"
-                set windowList to every window
-                repeat with aWindow in windowList
+{by_id_part}
+                -- 方法2/3: 一次遍历所有窗口，同时按进程名和窗口标题匹配
+                repeat with aWindow in every window
                     try
-                        set windowName to name of aWindow
-                        if windowName contains "{keyword}" then
+                        if (name of aWindow) contains "{keyword}" then
                             close aWindow saving no
-                            return true
+                            return "title"
                         end if
+                        repeat with aTab in tabs of aWindow
+                            repeat with aProcess in processes of aTab
+                                if aProcess contains "{keyword}" then
+                                    close aWindow saving no
+                                    return "process"
+                                end if
+                            end repeat
+                        end repeat
                     end try
                 end repeat
-                return false
-            end tell
-            '''
-            result = subprocess.run(
-                ['osascript', '-e', applescript],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0 and result.stdout.strip() == "true"
-        except Exception as e:
-            logger.debug(f"方法3失败: {e}")
-            return False
-    
-    def _close_window_by_shortcut(self) -> bool:
-        """方法4: 使用键盘快捷键关闭窗口 (Cmd+W) - 关闭最前面的终端窗口"""
-        try:
-            # 先激活 Terminal 应用
-            applescript_activate = '''
-            tell application "Terminal"
-                activate
             end tell
-            '''
-            subprocess.run(['osascript', '-e', applescript_activate], timeout=3)
-            time.sleep(0.3)
-            
-            # 使用 Cmd+W 关闭最前面的窗口
-            applescript_close = '''
+            -- 方法4: 激活 Terminal 后用 Cmd+W 关闭最前面的窗口
+            tell application "Terminal" to activate
+            delay 0.05
             tell application "System Events"
                 tell application process "Terminal"
                     keystroke "w" using command down
                 end tell
             end tell
+            return "shortcut"
             '''
-            result = subprocess.run(
-                ['osascript', '-e', applescript_close],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            return result.returncode == 0
+            ok, out = self._run_applescript(applescript, timeout=10)
+            if not ok:
+                return ''
+            # 输出必须恰好等于标记本身：错误文本里碰巧含 "id" 之类的
+            # 子串不能被当成某个方法成功
+            result = out.strip().strip('"')
+            if result in ('id', 'process', 'title', 'shortcut'):
+                return result
+            return ''
         except Exception as e:
-            logger.debug(f"方法4失败: {e}")
-            return False
+            logger.debug(f"关闭窗口失败: {e}")
+            return ''
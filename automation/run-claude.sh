@@ -22,6 +22,12 @@ LOG_FILE="$LOG_DIR/claude.log"
 # 创建日志目录
 mkdir -p "$LOG_DIR"
 
+# 预编译字节码: 循环每轮都会重新拉起 python3, 提前把 .pyc 编好,
+# 后续启动直接 mmap 缓存字节码而不是重新编译; 缓存放日志目录,
+# 源码目录只读也不受影响
+export PYTHONPYCACHEPREFIX="$LOG_DIR/pycache"
+python3 -m compileall -q "$AUTOMATION_DIR" 2>/dev/null
+
 # 解析参数
 PROGRESS_DOC="$1"
 
@@ -8,6 +8,10 @@ Cursor 24小时自动化任务执行管理器
 2. 解析任务状态和进度
 3. 自动调用 Cursor 完成任务
 4. 更新 progress.md 文件
+
+部署提示：run-claude.sh 会设置 PYTHONPYCACHEPREFIX 并预编译字节码，
+循环内的每次拉起直接加载 .pyc；追求更小驻留的场景可用 python3 -OO
+运行（剥离 docstring/assert）或打包为 zipapp 单文件分发
 """
 
 import os
@@ -16,11 +20,56 @@ import re
 import json
 import time
 import logging
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import subprocess
 
+# 执行器模块（claude_executor / cursor_executor）与本文件同目录，
+# 提前挂进 sys.path；加成员判断，避免每次执行任务都往 sys.path 头部塞一份
+_MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+if _MODULE_DIR not in sys.path:
+    sys.path.insert(0, _MODULE_DIR)
+
+from automation_config import ClaudeCodeConfig
+
+try:
+    import orjson  # 可选依赖：有则 JSON 编解码快 2-5 倍
+except ImportError:
+    orjson = None
+
+try:
+    import re2  # 可选依赖：google-re2，大文档上线性时间匹配
+except ImportError:
+    re2 = None
+
+
+def _compile_hot(pattern: bytes):
+    """热路径正则优先用 re2 编译，不可用或不支持该语法则回退标准库"""
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except Exception:
+            pass
+    return re.compile(pattern)
+
+
+def _json_dumps(obj) -> bytes:
+    """序列化为 UTF-8 字节串，优先走 orjson"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def _json_loads(data):
+    """从字节串反序列化，优先走 orjson"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 #############################################################################
 # 配置
 #############################################################################
@@ -49,9 +98,64 @@ STATE_FILE = os.path.join(AUTOMATION_DIR, "state.json")
 # 注意：run-claude.sh 会设置 EXECUTOR_TYPE=claude，确保使用 Claude Code
 EXECUTOR_TYPE = os.environ.get('EXECUTOR_TYPE', 'claude')  # 默认使用 Claude Code
 
+# 关闭所有运行 claude 命令的终端窗口（静态脚本，可被 osacompile 预编译缓存）
+CLOSE_CLAUDE_WINDOWS_SCRIPT = '''
+tell application "Terminal"
+    set windowList to every window
+    repeat with aWindow in windowList
+        try
+            -- 获取窗口中的所有标签页
+            set tabList to every tab of aWindow
+            set shouldClose to false
+
+            repeat with aTab in tabList
+                try
+                    set tabProcesses to processes of aTab
+                    -- 检查是否有 claude 进程
+                    if tabProcesses contains "claude" then
+                        set shouldClose to true
+                        exit repeat
+                    end if
+                end try
+            end repeat
+
+            if shouldClose then
+                close aWindow
+            end if
+        end try
+    end repeat
+end tell
+'''
+
 # 创建必要目录
 os.makedirs(LOG_DIR, exist_ok=True)
 
+#############################################################################
+# 预编译正则
+#############################################################################
+
+# 阶段文件名：step-N-xxx.md 或 N-xxx.md
+_STEP_FILENAME_RE = re.compile(r'step[-_](\d+)[-_](.+)\.md', re.IGNORECASE)
+_NUM_FILENAME_RE = re.compile(r'(\d+)[-_](.+)\.md')
+# 任务文档中的 "预计工时: X小时"
+_ESTIMATED_HOURS_RE = re.compile(r'预计工时[：:]\s*(\d+)')
+# 进度文档的结构锚点全是 ASCII（### Phase N: / - **状态**:），中文内容只是
+# 原样穿过的负载，因此进度文档统一按 bytes 读写和匹配，省掉整篇 UTF-8
+# 编解码。注意 bytes 正则里不能用多字节字符组成字符类，emoji 用或分支表达
+_PHASE_PATTERN = _compile_hot(
+    '### (?:Phase|Step) (\\d+):\\s*(.+?)\\n- \\*\\*状态\\*\\*:\\s*(\\S*\\s*(?:🟢|🟡|⬜|🔴)?[^-]*)'.encode('utf-8'))
+# 进度文档按行首的 Phase/Step 头切分；编号进捕获组，在 Python 侧按数值比较，
+# 避免把 phase_num 拼进正则导致每个编号都重新编译一次。
+# 用 re.split 预分段后，块内一律是不带 DOTALL 的短正则，
+# 不再让 .*? 跨行爬过整篇文档
+# 切分正则留在标准库引擎上：re2 封装的 split 不保留捕获组
+_HEADER_SPLIT_RE = re.compile(rb'(?m)(^### (?:Phase|Step) (\d+):)')
+_STATUS_LINE_RE = _compile_hot('- \\*\\*状态\\*\\*:.*?\\n'.encode('utf-8'))
+_TIME_LINE_RE = _compile_hot('- \\*\\*完成时间\\*\\*:.*?\\n'.encode('utf-8'))
+# 块内取值（作用于单个 Phase/Step 块，而不是整个文档）
+_STATUS_IN_BLOCK_RE = _compile_hot('- \\*\\*状态\\*\\*:\\s*(\\S+)'.encode('utf-8'))
+_TIME_IN_BLOCK_RE = _compile_hot('- \\*\\*完成时间\\*\\*:\\s*(\\S+)'.encode('utf-8'))
+
 #############################################################################
 # 日志配置
 #############################################################################
@@ -71,11 +175,55 @@ logger = logging.getLogger('TaskManager')
 #############################################################################
 
 class TaskStatus:
-    """任务状态枚举"""
-    PENDING = "⬜ 未开始"
-    IN_PROGRESS = "🟡 进行中"
-    COMPLETED = "🟢 已完成"
-    BLOCKED = "🔴 阻塞/问题"
+    """任务状态枚举
+
+    四个取值全部 sys.intern：状态只会经由这里或 _STATUS_MAP 赋值，
+    比较可以走指针同一性而不是逐字符对比
+    """
+    PENDING = sys.intern("⬜ 未开始")
+    IN_PROGRESS = sys.intern("🟡 进行中")
+    COMPLETED = sys.intern("🟢 已完成")
+    BLOCKED = sys.intern("🔴 阻塞/问题")
+
+
+# 状态分类查表：一次正则命中 + 一次字典查找，
+# 替代解析热循环里每个阶段最多 8 次的子串扫描级联
+_STATUS_CLASS_RE = _compile_hot('🟢|🟡|🔴|⬜|已完成|进行中|阻塞|未开始'.encode('utf-8'))
+_STATUS_MAP = {
+    key.encode('utf-8'): value
+    for key, value in (
+        ('🟢', TaskStatus.COMPLETED), ('已完成', TaskStatus.COMPLETED),
+        ('🟡', TaskStatus.IN_PROGRESS), ('进行中', TaskStatus.IN_PROGRESS),
+        ('🔴', TaskStatus.BLOCKED), ('阻塞', TaskStatus.BLOCKED),
+        ('⬜', TaskStatus.PENDING), ('未开始', TaskStatus.PENDING),
+    )
+}
+
+
+# 状态 → 渲染 emoji 的查表：四个取值各算一次 partition，
+# 渲染循环里不再为每个阶段做一次 split 分配
+_STATUS_EMOJI = {
+    status: status.partition(' ')[0]
+    for status in (TaskStatus.PENDING, TaskStatus.IN_PROGRESS,
+                   TaskStatus.COMPLETED, TaskStatus.BLOCKED)
+}
+
+
+def _split_phase_blocks(content: bytes):
+    """把进度文档切成 (序言, [(编号, 头部, 正文), ...])，可无损拼回"""
+    parts = _HEADER_SPLIT_RE.split(content)
+    blocks = []
+    for i in range(1, len(parts), 3):
+        blocks.append((int(parts[i + 1]), parts[i], parts[i + 2]))
+    return parts[0], blocks
+
+
+def _classify_status(status_bytes: bytes) -> str:
+    """从状态字节串归类到 TaskStatus，未命中归为未开始"""
+    match = _STATUS_CLASS_RE.search(status_bytes)
+    if match is None:
+        return TaskStatus.PENDING
+    return _STATUS_MAP[match.group(0)]
 
 class Phase:
     """项目阶段"""
@@ -90,6 +238,14 @@ class Phase:
         self.estimated_hours = 0
         self.actual_hours = 0
 
+    @property
+    def status_emoji(self) -> str:
+        """状态行首的渲染符号，已知状态走预计算查表"""
+        emoji = _STATUS_EMOJI.get(self.status)
+        if emoji is None:
+            emoji = self.status.partition(' ')[0]
+        return emoji
+
     def to_dict(self) -> Dict:
         return {
             'phase_num': self.phase_num,
@@ -110,20 +266,36 @@ class Project:
         self.path = path
         self.phases: List[Phase] = []
         self.created_at = datetime.now().isoformat()
+        # 已完成阶段计数随增删/改状态增量维护，完成度查询 O(1)
+        self._completed_count = 0
 
     def add_phase(self, phase: Phase):
         self.phases.append(phase)
+        if phase.status is TaskStatus.COMPLETED:
+            self._completed_count += 1
+
+    def set_phase_status(self, phase: Phase, status: str):
+        """改阶段状态的唯一入口，同步维护已完成计数"""
+        if phase.status is TaskStatus.COMPLETED:
+            self._completed_count -= 1
+        phase.status = status
+        if status is TaskStatus.COMPLETED:
+            self._completed_count += 1
+
+    @property
+    def completed_count(self) -> int:
+        """已完成阶段数（增量维护，O(1)）"""
+        return self._completed_count
 
     def get_pending_phases(self) -> List[Phase]:
         """获取待处理阶段"""
-        return [p for p in self.phases if p.status != TaskStatus.COMPLETED]
+        return [p for p in self.phases if p.status is not TaskStatus.COMPLETED]
 
     def get_completion_percentage(self) -> float:
         """获取完成度百分比"""
         if not self.phases:
             return 0.0
-        completed = sum(1 for p in self.phases if p.status == TaskStatus.COMPLETED)
-        return (completed / len(self.phases)) * 100
+        return (self._completed_count / len(self.phases)) * 100
 
     def to_dict(self) -> Dict:
         return {
@@ -132,7 +304,7 @@ class Project:
             'created_at': self.created_at,
             'completion': self.get_completion_percentage(),
             'total_phases': len(self.phases),
-            'completed_phases': sum(1 for p in self.phases if p.status == TaskStatus.COMPLETED),
+            'completed_phases': self._completed_count,
             'phases': [p.to_dict() for p in self.phases]
         }
 
@@ -140,6 +312,55 @@ class Project:
 # 任务解析器
 #############################################################################
 
+# 解析结果缓存：monitor_loop 每 15 分钟全量扫一遍，而树大多数时候没变化
+# parse_project 按进度文件的 (mtime_ns, size) 复用上次的 Project。
+# 注意项目列表本身不做缓存：目录 mtime 只反映直接子项的变化，
+# 深层新建的项目（issue/<epic>/<子任务>/plan/...）不会更新根目录
+# mtime，按根 mtime 缓存会永远漏掉它们
+_PROJECT_CACHE: Dict[str, Tuple[int, int, 'Project']] = {}
+
+# 支持两种进度文件名：progress.md 和 0-进度文档.md
+_PROGRESS_NAMES = ('progress.md', '0-进度文档.md')
+
+# 扫描时直接剪掉的目录：依赖/构建产物和各类缓存里不会有任务项目，
+# 但文件数可能比任务树本身多几个数量级
+_SKIP_DIRS = frozenset((
+    'node_modules', '__pycache__', 'target', 'build', 'dist',
+    '.git', '.venv', '.idea', '.vscode', 'logs',
+))
+
+
+def _resolve_progress_file(plan_path: str) -> Optional[str]:
+    """在 plan 目录下定位进度文件，一次 scandir 代替逐个 exists 探测"""
+    try:
+        with os.scandir(plan_path) as it:
+            names = {entry.name for entry in it}
+    except OSError:
+        return None
+    for progress_filename in _PROGRESS_NAMES:
+        if progress_filename in names:
+            return os.path.join(plan_path, progress_filename)
+    return None
+
+
+def _slurp_bytes(path: str) -> bytes:
+    """按 fstat 大小一次读完整个文件，绕开 io 栈的缓冲层开销"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        content = os.read(fd, size)
+        # NFS 等场景 read 可能不足量，补读到 EOF
+        while len(content) < size:
+            chunk = os.read(fd, size - len(content))
+            if not chunk:
+                break
+            content += chunk
+        return content
+    finally:
+        os.close(fd)
+
+
+
 class TaskParser:
     """解析任务文档"""
 
@@ -148,37 +369,56 @@ class TaskParser:
         """递归查找所有项目目录（包含 plan 子目录的目录）"""
         projects = []
 
-        if not os.path.exists(root_path):
+        if not os.path.isdir(root_path):
             logger.error(f"路径不存在: {root_path}")
             return projects
 
-        # 递归遍历所有目录，查找包含 plan 子目录的目录
-        for root, dirs, files in os.walk(root_path):
-            # 如果当前目录包含 plan 子目录
-            if 'plan' in dirs:
-                plan_path = os.path.join(root, 'plan')
+        # 基于 os.scandir 的显式栈遍历：DirEntry 的 is_dir() 直接用
+        # readdir 的结果回答，不像 os.walk + os.path.exists 那样
+        # 对每个候选路径再补一次 stat
+        stack = [root_path]
+        while stack:
+            current = stack.pop()
+            plan_path = None
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name == 'plan':
+                                plan_path = entry.path
+                            elif (entry.name not in _SKIP_DIRS
+                                    and not entry.name.startswith('.')):
+                                stack.append(entry.path)
+            except OSError as e:
+                logger.debug("扫描目录失败 %s: %s", current, e)
+                continue
+
+            # 如果当前目录包含 plan 子目录：读一次 plan 目录拿到全部文件名，
+            # 替代对两种进度文件名各做一次 os.path.exists
+            if plan_path is not None:
+                try:
+                    with os.scandir(plan_path) as it:
+                        names = {entry.name for entry in it}
+                except OSError:
+                    names = set()
 
                 # 支持两种进度文件名：progress.md 和 0-进度文档.md
-                progress_files = ['progress.md', '0-进度文档.md']
                 progress_file_found = None
-
-                for progress_filename in progress_files:
-                    progress_file = os.path.join(plan_path, progress_filename)
-                    if os.path.exists(progress_file):
+                for progress_filename in _PROGRESS_NAMES:
+                    if progress_filename in names:
                         progress_file_found = progress_filename
                         break
 
                 # 确保找到了进度文件
                 if progress_file_found:
-                    projects.append(root)
+                    projects.append(current)
                     # 显示相对路径，更易读
-                    rel_path = os.path.relpath(root, root_path)
-                    logger.info(f"找到项目: {rel_path} (进度文件: {progress_file_found})")
+                    rel_path = os.path.relpath(current, root_path)
+                    logger.info("找到项目: %s (进度文件: %s)", rel_path, progress_file_found)
 
         # 按路径排序，确保执行顺序一致
         projects.sort()
         logger.info(f"共找到 {len(projects)} 个项目")
-
         return projects
 
     @staticmethod
@@ -191,26 +431,29 @@ class TaskParser:
             logger.warning(f"项目缺少 plan 目录: {project_path}")
             return None
 
-        # 支持两种进度文件名：progress.md 和 0-进度文档.md
-        progress_files = ['progress.md', '0-进度文档.md']
-        progress_file = None
-
-        for progress_filename in progress_files:
-            candidate = os.path.join(plan_path, progress_filename)
-            if os.path.exists(candidate):
-                progress_file = candidate
-                break
-
+        progress_file = _resolve_progress_file(plan_path)
         if not progress_file:
             logger.warning(f"项目缺少进度文件 (progress.md 或 0-进度文档.md): {project_path}")
             return None
 
+        # 进度文件没变就复用上次解析的结果，省掉整轮文件读取和正则匹配
+        try:
+            st = os.stat(progress_file)
+        except OSError:
+            st = None
+        if st is not None:
+            cached = _PROJECT_CACHE.get(progress_file)
+            if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+
         project = Project(project_name, project_path)
 
         # 直接从进度文件解析任务清单
         TaskParser.parse_phases_from_progress(project, plan_path)
 
         logger.info(f"项目 {project_name} 包含 {len(project.phases)} 个阶段")
+        if st is not None:
+            _PROJECT_CACHE[progress_file] = (st.st_mtime_ns, st.st_size, project)
         return project
 
     @staticmethod
@@ -223,10 +466,10 @@ class TaskParser:
             #   step-1-状态枚举和流转规则实现.md
             
             # 首先尝试 step-N- 格式
-            match = re.match(r'step[-_](\d+)[-_](.+)\.md', filename, re.IGNORECASE)
+            match = _STEP_FILENAME_RE.match(filename)
             if not match:
                 # 然后尝试 N- 格式
-                match = re.match(r'(\d+)[-_](.+)\.md', filename)
+                match = _NUM_FILENAME_RE.match(filename)
             
             if not match:
                 logger.warning(f"无法解析阶段文件名: {filename}")
@@ -241,7 +484,7 @@ class TaskParser:
                 with open(filepath, 'r', encoding='utf-8') as f:
                     content = f.read()
                     # 查找 "预计工时: X小时"
-                    time_match = re.search(r'预计工时[：:]\s*(\d+)', content)
+                    time_match = _ESTIMATED_HOURS_RE.search(content)
                     if time_match:
                         estimated_hours = int(time_match.group(1))
             except Exception as e:
@@ -258,51 +501,30 @@ class TaskParser:
     @staticmethod
     def parse_phases_from_progress(project: Project, plan_path: str):
         """直接从进度文件解析所有任务清单（不依赖文件名格式）"""
-        # 支持两种进度文件名：progress.md 和 0-进度文档.md
-        progress_files = ['progress.md', '0-进度文档.md']
-        progress_file = None
-
-        for progress_filename in progress_files:
-            candidate = os.path.join(plan_path, progress_filename)
-            if os.path.exists(candidate):
-                progress_file = candidate
-                break
-
+        progress_file = _resolve_progress_file(plan_path)
         if not progress_file:
             logger.warning(f"进度文件不存在: {plan_path}")
             return
         
         try:
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = _slurp_bytes(progress_file)
             
             # 查找所有 Phase/Step 定义：### Phase N: ... 或 ### Step N: ...
-            # 使用正则表达式提取 Phase/Step 编号、名称、文档链接和状态
-            # 同时支持 Phase 和 Step 格式
-            phase_pattern = r'### (?:Phase|Step) (\d+):\s*(.+?)\n- \*\*状态\*\*:\s*(\S*\s*[🟢🟡⬜🔴]?[^-]*)'
-            
-            for match in re.finditer(phase_pattern, content):
+            # 使用预编译正则提取 Phase/Step 编号、名称、文档链接和状态
+            # 文档按 bytes 匹配，只有进入数据模型的阶段名才解码
+            for match in _PHASE_PATTERN.finditer(content):
                 phase_num = int(match.group(1))
-                phase_name = match.group(2).strip()
-                status_str = match.group(3).strip()
+                phase_name = match.group(2).strip().decode('utf-8', 'replace')
                 
-                # 从状态字符串中提取状态符号
-                status = TaskStatus.PENDING  # 默认值
-                if '🟢' in status_str or '已完成' in status_str:
-                    status = TaskStatus.COMPLETED
-                elif '🟡' in status_str or '进行中' in status_str:
-                    status = TaskStatus.IN_PROGRESS
-                elif '🔴' in status_str or '阻塞' in status_str:
-                    status = TaskStatus.BLOCKED
-                else:
-                    status = TaskStatus.PENDING
+                # 从状态字节串中提取状态符号
+                status = _classify_status(match.group(3))
                 
                 # 创建 Phase 对象
                 phase = Phase(phase_num, phase_name, "")  # doc_file 暂时为空
                 phase.status = status
                 project.add_phase(phase)
                 
-                logger.debug(f"解析 Phase {phase_num}: {phase_name} - 状态: {status}")
+                logger.debug("解析 Phase %d: %s - 状态: %s", phase_num, phase_name, status)
             
             # 按 Phase 编号排序
             project.phases.sort(key=lambda p: p.phase_num)
@@ -315,46 +537,33 @@ class TaskParser:
     @staticmethod
     def update_phases_from_progress(project: Project, plan_path: str):
         """从进度文件更新阶段状态（兼容旧版本）"""
-        # 支持两种进度文件名：progress.md 和 0-进度文档.md
-        progress_files = ['progress.md', '0-进度文档.md']
-        progress_file = None
-
-        for progress_filename in progress_files:
-            candidate = os.path.join(plan_path, progress_filename)
-            if os.path.exists(candidate):
-                progress_file = candidate
-                break
-
+        progress_file = _resolve_progress_file(plan_path)
         if not progress_file:
             logger.warning(f"进度文件不存在: {plan_path}")
             return
         
         try:
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = _slurp_bytes(progress_file)
             
-            # 查找每个 Phase/Step 的状态
+            # 一趟切块建索引：之前每个 phase 都要对全文跑两次 DOTALL 搜索，
+            # K 个阶段就是 2K 趟全文扫描；现在是 O(|文档| + K)
+            _, phase_blocks = _split_phase_blocks(content)
+            blocks = {num: body for num, _, body in phase_blocks}
+
             for phase in project.phases:
-                phase_pattern = rf'### (?:Phase|Step) {phase.phase_num}:.*?- \*\*状态\*\*:\s*(\S+)'
-                match = re.search(phase_pattern, content, re.DOTALL)
-                
+                block = blocks.get(phase.phase_num)
+                if block is None:
+                    continue
+
+                match = _STATUS_IN_BLOCK_RE.search(block)
                 if match:
-                    status_str = match.group(1).strip()
                     # 匹配状态符号
-                    if '🟢' in status_str or '已完成' in status_str:
-                        phase.status = TaskStatus.COMPLETED
-                    elif '🟡' in status_str or '进行中' in status_str:
-                        phase.status = TaskStatus.IN_PROGRESS
-                    elif '🔴' in status_str or '阻塞' in status_str:
-                        phase.status = TaskStatus.BLOCKED
-                    else:
-                        phase.status = TaskStatus.PENDING
+                    project.set_phase_status(phase, _classify_status(match.group(1)))
                 
                 # 获取完成时间
-                time_pattern = rf'### (?:Phase|Step) {phase.phase_num}:.*?- \*\*完成时间\*\*:\s*(\S+)'
-                time_match = re.search(time_pattern, content, re.DOTALL)
+                time_match = _TIME_IN_BLOCK_RE.search(block)
                 if time_match:
-                    phase.end_time = time_match.group(1).strip()
+                    phase.end_time = time_match.group(1).strip().decode('utf-8', 'replace')
         
         except Exception as e:
             logger.error(f"更新阶段状态失败: {e}")
@@ -367,63 +576,63 @@ class ProgressUpdater:
     """更新 progress.md 文件"""
 
     @staticmethod
-    def update_phase_status(project: Project, phase_num: int,
-                           status: str, notes: str = "", hours: int = 0):
-        """更新阶段状态"""
-        plan_path = os.path.join(project.path, 'plan')
+    def batch_update(project: Project, updates: Dict[int, Tuple[str, str, int]]) -> bool:
+        """批量更新多个阶段状态：phase_num -> (status, notes, hours)
 
-        # 支持两种进度文件名：progress.md 和 0-进度文档.md
-        progress_files = ['progress.md', '0-进度文档.md']
-        progress_file = None
+        N 个阶段逐个走 update_phase_status 要付 N 次整文件读写外加
+        每次两趟全文替换；这里读一次、在命中的块内替换、写一次
+        """
+        if not updates:
+            return True
 
-        for progress_filename in progress_files:
-            candidate = os.path.join(plan_path, progress_filename)
-            if os.path.exists(candidate):
-                progress_file = candidate
-                break
+        plan_path = os.path.join(project.path, 'plan')
 
+        progress_file = _resolve_progress_file(plan_path)
         if not progress_file:
             logger.warning(f"进度文件不存在: {plan_path}")
             return False
         
         try:
-            with open(progress_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+            content = _slurp_bytes(progress_file)
             
-            # 构建新的状态行
             completion_time = datetime.now().strftime('%Y-%m-%d')
-            new_status_line = f"- **状态**: {status}"
-            new_time_line = f"- **完成时间**: {completion_time}"
-            
-            # 找到对应 Phase/Step 的部分并更新
-            phase_pattern = rf'(### (?:Phase|Step) {phase_num}:.*?)(- \*\*状态\*\*:.*?\n)'
-            content = re.sub(
-                phase_pattern,
-                rf'\1{new_status_line}\n',
-                content,
-                flags=re.DOTALL
-            )
             
-            # 如果是完成状态，也更新完成时间
-            if '🟢' in status:
-                time_pattern = rf'(### (?:Phase|Step) {phase_num}:.*?)(- \*\*完成时间\*\*:.*?\n)'
-                content = re.sub(
-                    time_pattern,
-                    rf'\1{new_time_line}\n',
-                    content,
-                    flags=re.DOTALL
-                )
+            # 预分段后按块定位待更新的 Phase/Step：编号在 Python 侧查表，
+            # 状态/完成时间行用不带 DOTALL 的短正则只在命中的块内替换；
+            # 全程 bytes 操作，未改动的中文内容不经过任何编解码
+            preamble, phase_blocks = _split_phase_blocks(content)
+            pieces = [preamble]
+            for block_num, header, body in phase_blocks:
+                update = updates.get(block_num)
+                if update is not None:
+                    status = update[0]
+                    body = _STATUS_LINE_RE.sub(
+                        f'- **状态**: {status}\n'.encode('utf-8'), body, count=1)
+                    # 如果是完成状态，也更新完成时间
+                    if '🟢' in status:
+                        body = _TIME_LINE_RE.sub(
+                            f'- **完成时间**: {completion_time}\n'.encode('utf-8'), body, count=1)
+                pieces.append(header)
+                pieces.append(body)
+            content = b''.join(pieces)
             
-            with open(progress_file, 'w', encoding='utf-8') as f:
+            with open(progress_file, 'wb') as f:
                 f.write(content)
             
-            logger.info(f"已更新 Phase {phase_num} 状态: {status}")
+            for phase_num in sorted(updates):
+                logger.info("已更新 Phase %d 状态: %s", phase_num, updates[phase_num][0])
             return True
         
         except Exception as e:
             logger.error(f"更新失败: {e}")
             return False
 
+    @staticmethod
+    def update_phase_status(project: Project, phase_num: int,
+                           status: str, notes: str = "", hours: int = 0):
+        """更新单个阶段状态（batch_update 的便捷封装）"""
+        return ProgressUpdater.batch_update(project, {phase_num: (status, notes, hours)})
+
 #############################################################################
 # 任务执行器
 #############################################################################
@@ -433,10 +642,37 @@ class TaskExecutor:
 
     def __init__(self):
         self.state = self.load_state()
+        # 脏标记：状态没变时 save_state 直接跳过整个序列化+写盘
+        self._state_dirty = False
         # 保持 ClaudeCodeManager 实例为单例，以便在多次任务执行之间保持终端窗口ID
         self.claude_manager = None
         self.agent_manager = None
+        # 预编译 AppleScript 的缓存路径：None=未尝试，''=编译失败
+        self._close_script_path: Optional[str] = None
+        # 上次落盘内容的摘要：内容没变就不重写文件
+        self._last_state_hash: Optional[bytes] = None
+
+
+    def _compiled_close_script(self) -> Optional[str]:
+        """用 osacompile 预编译关窗脚本并缓存路径
+
+        脚本内容固定，编译一次后每轮清理直接跑 .scpt，
+        省掉 osascript 每次对源码的解析编译；编译失败则记住结果，
+        回退到 -e 源码执行且不再重试
+        """
+        if self._close_script_path is not None:
+            return self._close_script_path or None
 
+        scpt_path = os.path.join(LOG_DIR, 'close_claude_windows.scpt')
+        try:
+            subprocess.run(
+                ['osacompile', '-o', scpt_path, '-e', CLOSE_CLAUDE_WINDOWS_SCRIPT],
+                capture_output=True, timeout=15, check=True)
+            self._close_script_path = scpt_path
+        except Exception as e:
+            logger.debug("osacompile 预编译失败，回退源码执行: %s", e)
+            self._close_script_path = ''
+        return self._close_script_path or None
 
     def _cleanup_current_session(self):
         """清理当前会话的资源（所有相关进程和终端窗口）"""
@@ -457,35 +693,17 @@ class TaskExecutor:
 
                     # 步骤2: 关闭所有运行 claude 命令的终端窗口
                     logger.info("🔄 关闭所有 Claude 相关的终端窗口...")
-                    applescript_close_all = '''
-                    tell application "Terminal"
-                        set windowList to every window
-                        repeat with aWindow in windowList
-                            try
-                                -- 获取窗口中的所有标签页
-                                set tabList to every tab of aWindow
-                                set shouldClose to false
-
-                                repeat with aTab in tabList
-                                    try
-                                        set tabProcesses to processes of aTab
-                                        -- 检查是否有 claude 进程
-                                        if tabProcesses contains "claude" then
-                                            set shouldClose to true
-                                            exit repeat
-                                        end if
-                                    end try
-                                end repeat
-
-                                if shouldClose then
-                                    close aWindow
-                                end if
-                            end try
-                        end repeat
-                    end tell
-                    '''
                     try:
-                        subprocess.run(['osascript', '-e', applescript_close_all], timeout=10)
+                        # close_fds=False 让 subprocess 走 posix_spawn
+                        # 快速路径，省掉每次清理的 fork + 遍历关闭 fd
+                        scpt = self._compiled_close_script()
+                        if scpt:
+                            subprocess.run(['osascript', scpt],
+                                           timeout=10, close_fds=False)
+                        else:
+                            subprocess.run(
+                                ['osascript', '-e', CLOSE_CLAUDE_WINDOWS_SCRIPT],
+                                timeout=10, close_fds=False)
                         logger.info("✅ Claude 终端窗口已关闭")
                     except Exception as e:
                         logger.warning(f"关闭终端窗口失败: {e}")
@@ -501,16 +719,47 @@ class TaskExecutor:
         """加载执行状态"""
         if os.path.exists(STATE_FILE):
             try:
-                with open(STATE_FILE, 'r') as f:
-                    return json.load(f)
+                with open(STATE_FILE, 'rb') as f:
+                    return _json_loads(f.read())
             except:
                 pass
         return {'last_run': None, 'completed_phases': []}
 
+    def mark_state_dirty(self):
+        """标记状态已修改，下次 save_state 时落盘"""
+        self._state_dirty = True
+
     def save_state(self):
-        """保存执行状态"""
-        with open(STATE_FILE, 'w') as f:
-            json.dump(self.state, f, indent=2)
+        """保存执行状态（状态未修改时直接返回）
+
+        内容摘要没变就跳过写盘；真正落盘时走临时文件 + fsync + rename，
+        进程中途被杀也不会留下半截 state.json
+        """
+        if not self._state_dirty:
+            return
+
+        payload = _json_dumps(self.state)
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        if digest == self._last_state_hash:
+            self._state_dirty = False
+            return
+
+        fd, tmp_path = tempfile.mkstemp(
+            dir=AUTOMATION_DIR, prefix='.state.json.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, STATE_FILE)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._last_state_hash = digest
+        self._state_dirty = False
 
     def execute_phase(self, project: Project, phase: Phase) -> bool:
         """执行单个阶段 - 调用 Cursor/Claude Code 执行任务"""
@@ -532,7 +781,6 @@ class TaskExecutor:
             
             logger.info(f"指令已保存到: {instruction_file}")
             # 根据配置显示文件修改检测状态
-            from automation_config import ClaudeCodeConfig
             if ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION:
                 logger.info(f"💡 文件修改检测已启用，完整输出将保存到 logs/claude_output_*.log")
             else:
@@ -550,11 +798,6 @@ class TaskExecutor:
     def invoke_cursor_with_instruction(self, instruction: str, instruction_file: str) -> bool:
         """自动执行任务指令 - 支持 Cursor 或 Claude Code"""
         try:
-            # 导入执行器模块
-            import sys
-            import os
-            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-
             # 生成任务 ID
             task_id = f"task_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
@@ -756,8 +999,9 @@ class TaskExecutor:
 """
         return instruction
 
-    def monitor_loop(self, interval: int = 900, max_duration: int = 24 * 60 * 60):
-        """监控循环（24小时）"""
+    def monitor_loop(self, progress_doc: str, interval: int = 900,
+                     max_duration: int = 24 * 60 * 60):
+        """监控循环（24小时，同步版；CLI 的 --monitor 走 _monitor_async）"""
         logger.info("=" * 60)
         logger.info("启动 24 小时监控模式")
         logger.info(f"检查间隔: {interval} 秒 ({interval / 60:.1f} 分钟)")
@@ -774,16 +1018,23 @@ class TaskExecutor:
                 
                 logger.info(f"\n[循环 #{loop_count}] 已运行: {elapsed / 60:.1f} 分钟")
                 
-                # 扫描所有项目
-                self.scan_and_execute_tasks()
+                # 扫描指定进度文档中的任务
+                self.scan_and_execute_tasks(progress_doc)
                 
                 # 检查是否超时
                 if elapsed > max_duration:
                     logger.warning(f"已运行 {max_duration / 3600:.1f} 小时，停止监控")
                     break
                 
-                logger.info(f"将在 {interval} 秒后进行下一次检查...")
-                time.sleep(interval)
+                # 按绝对截止时刻对齐休眠：扫描本身耗时不再拖慢节拍，
+                # 长跑 24 小时也不会逐圈漂移
+                next_deadline = start_time + loop_count * interval
+                remaining = next_deadline - time.time()
+                if remaining > 0:
+                    logger.info(f"将在 {remaining:.0f} 秒后进行下一次检查...")
+                    time.sleep(remaining)
+                else:
+                    logger.warning(f"本轮扫描超出检查间隔 {-remaining:.0f} 秒，立即开始下一轮")
         
         except KeyboardInterrupt:
             logger.info("监控被中断")
@@ -825,7 +1076,6 @@ class TaskExecutor:
             if self.invoke_cursor_with_instruction(instruction, instruction_file):
                 logger.info(f"✅ AI自主任务查找指令已提交到执行器")
                 # 根据配置显示文件修改检测状态
-                from automation_config import ClaudeCodeConfig
                 if ClaudeCodeConfig.ENABLE_FILE_MODIFICATION_DETECTION:
                     logger.info(f"💡 文件修改检测已启用，完整输出将保存到 logs/claude_output_*.log")
                 else:
@@ -838,8 +1088,11 @@ class TaskExecutor:
             import traceback
             logger.error(traceback.format_exc())
 
-    def show_status(self):
-        """显示所有项目的任务状态"""
+    def show_status(self) -> str:
+        """显示所有项目的任务状态，并返回渲染好的报告文本
+
+        返回值给守护进程用：--client -s 时把同一份文本原样发回客户端
+        """
         logger.info("=" * 60)
         logger.info("项目任务状态")
         logger.info("=" * 60)
@@ -848,47 +1101,439 @@ class TaskExecutor:
         
         if not project_paths:
             logger.warning("未找到任何项目")
-            return
+            return ''
         
-        for project_path in project_paths:
-            project = TaskParser.parse_project(project_path)
+        # parse_project 是纯 I/O（scandir + 文件读取），线程池扇出
+        # 让多个项目的文件系统等待相互重叠；map 保持路径顺序
+        with ThreadPoolExecutor(max_workers=min(16, len(project_paths))) as pool:
+            projects = list(pool.map(TaskParser.parse_project, project_paths))
+
+        # 全部行攒进一个缓冲区一次写出：每行 print 都要拿一次 stdout
+        # 锁外加一次系统调用，阶段多的项目列表就是 O(行数) 次 write
+        lines = []
+        for project in projects:
             if not project:
                 continue
-            
-            print(f"\n📦 {project.name}")
-            print(f"   完成度: {project.get_completion_percentage():.1f}% "
-                  f"({sum(1 for p in project.phases if p.status == TaskStatus.COMPLETED)}"
-                  f"/{len(project.phases)})")
-            
+
+            lines.append(f"\n📦 {project.name}")
+            lines.append(f"   完成度: {project.get_completion_percentage():.1f}% "
+                         f"({project.completed_count}"
+                         f"/{len(project.phases)})")
+
             for phase in project.phases:
-                status_emoji = phase.status.split()[0]
-                print(f"   {status_emoji} Phase {phase.phase_num}: {phase.name}")
+                lines.append(f"   {phase.status_emoji} Phase {phase.phase_num}: {phase.name}")
+
+        report = "\n".join(lines) + "\n" if lines else ''
+        if report:
+            sys.stdout.write(report)
+        return report
 
 #############################################################################
 # 主程序
 #############################################################################
 
-def main():
-    """主程序入口"""
+# 预渲染的帮助文本：无参数或 -h/--help 时整串写出即可返回，
+# 这条路径连 argparse 都不用导入，更不用跑帮助格式化器
+STATIC_HELP = """\
+用法: python task_manager.py [-m | -e | -s] [-i INTERVAL] [-p PROGRESS_DOC] [-t TASK_NUM]
+
+Cursor 24小时自动化任务执行管理器
+
+选项:
+  -h, --help            显示帮助
+  -m, --monitor         启动 24 小时监控模式（每 5 分钟检查一次）
+  -e, --execute         单次执行所有待处理任务
+  -s, --status          显示所有项目的任务状态
+  -i, --interval        监控间隔（秒），默认 900（15分钟）
+  -c, --concurrency     同时派发的任务扫描数上限，默认 1（大于 1 的值暂按 1 处理）
+  -p, --progress-doc    指定进度文档路径（执行模式必需）
+  -t, --task-num        指定任务编号（可选，如果指定则直接执行该任务）
+  -w, --watch           进度文档变化即触发检查，--interval 作为延迟上限
+  --daemon              常驻守护进程模式，监听 Unix 套接字
+  --client              把后续参数转发给守护进程执行
+
+示例:
+  # 启动 24 小时监控模式
+  python task_manager.py --monitor
+
+  # 单次执行所有待处理任务
+  python task_manager.py --execute
+
+  # 显示任务状态
+  python task_manager.py --status
+"""
+
+
+# 守护进程监听的 Unix 套接字路径
+DAEMON_SOCKET = '/tmp/task_manager.sock'
+
+
+def _import_argparse():
+    """导入 argparse 并旁路它的 gettext 查表
+
+    界面文案全部是中文字面量，argparse 构造期间的几千次 dgettext
+    调用只会原样返回英文模板，直接用恒等函数代替
+    """
     import argparse
-    
-    parser = argparse.ArgumentParser(
-        description='Cursor 24小时自动化任务执行管理器',
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
+    if not getattr(argparse, '_gettext_bypassed', False):
+        argparse._ = lambda s: s
+        argparse.ngettext = lambda singular, plural, n: (
+            singular if n == 1 else plural)
+        argparse._gettext_bypassed = True
+    return argparse
+
+
+def _daemon_main():
+    """--daemon 模式：常驻进程 + Unix 套接字
+
+    模块导入和 TaskExecutor 只初始化一次，编辑器插件、cron 这类高频
+    调用方通过 --client 转发命令，每次只付几微秒的 IPC 而不是整个
+    Python 启动
+    """
+    import socket
+
+    try:
+        os.unlink(DAEMON_SOCKET)
+    except OSError:
+        pass
+
+    executor = TaskExecutor()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(DAEMON_SOCKET)
+    server.listen(1)
+    logger.info(f"守护进程已启动，监听 {DAEMON_SOCKET}")
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            try:
+                data = conn.recv(65536)
+                if not data:
+                    continue
+                reply = _daemon_dispatch(executor, _json_loads(data))
+                conn.sendall(_json_dumps(reply))
+            except Exception as e:
+                logger.error(f"处理客户端请求失败: {e}")
+                try:
+                    conn.sendall(_json_dumps({'ok': False, 'error': str(e)}))
+                except OSError:
+                    pass
+            finally:
+                conn.close()
+    except KeyboardInterrupt:
+        logger.info("守护进程被中断")
+    finally:
+        server.close()
+        try:
+            os.unlink(DAEMON_SOCKET)
+        except OSError:
+            pass
+
+
+def _daemon_dispatch(executor, argv):
+    """在常驻 executor 上执行一条客户端命令"""
+    argparse = _import_argparse()
+
+    parser = argparse.ArgumentParser(prog='task_manager --client', add_help=False)
+    parser.add_argument('-e', '--execute', action='store_true')
+    parser.add_argument('-s', '--status', action='store_true')
+    parser.add_argument('-p', '--progress-doc', type=str, default=None)
+    parser.add_argument('-t', '--task-num', type=str, default=None)
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit:
+        return {'ok': False, 'error': f'无法解析参数: {argv}'}
+
+    if args.status:
+        return {'ok': True, 'result': 'status', 'output': executor.show_status()}
+    if not args.progress_doc:
+        return {'ok': False, 'error': '执行模式需要指定进度文档路径 (-p)'}
+    executor.scan_and_execute_tasks(progress_doc=args.progress_doc, task_num=args.task_num)
+    return {'ok': True, 'result': 'execute'}
+
+
+def _client_main(argv):
+    """--client 模式：把参数转发给守护进程；套接字不存在则就地执行"""
+    import socket
+
+    if not os.path.exists(DAEMON_SOCKET):
+        logger.info("守护进程未运行，回退为进程内执行")
+        sys.argv = [sys.argv[0]] + argv
+        main()
+        return
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(DAEMON_SOCKET)
+        client.sendall(_json_dumps(argv))
+        client.shutdown(socket.SHUT_WR)
+        data = client.recv(65536)
+    finally:
+        client.close()
+
+    if not data:
+        print('守护进程无响应')
+        return
+    reply = _json_loads(data)
+    # 带渲染输出的回复（如 -s 的状态报告）原样写出，调用方拿到的
+    # 就是守护进程端生成的那份文本
+    if isinstance(reply, dict) and reply.get('output'):
+        sys.stdout.write(reply['output'])
+    else:
+        print(reply)
+
+
+def _status_main():
+    """--status 模式：不需要其他参数，跳过完整解析器直接显示状态"""
+    TaskExecutor().show_status()
+
+
+def _monitor_main(argv):
+    """--monitor 模式：只构造监控相关的参数"""
+    argparse = _import_argparse()
+
+    parser = argparse.ArgumentParser(description='启动 24 小时监控模式')
+    parser.add_argument('-m', '--monitor', action='store_true',
+                        help='启动 24 小时监控模式（每 5 分钟检查一次）')
+    parser.add_argument('-i', '--interval', type=int, default=900,
+                        help='监控间隔（秒），默认 900（15分钟）')
+    parser.add_argument('-c', '--concurrency', type=int, default=1,
+                        help='同时派发的任务扫描数上限，默认 1'
+                             '（扫描暂不可重入，大于 1 的值按 1 处理）')
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help='进度文档变化即触发检查，--interval 作为延迟上限')
+    # required=True 让 argparse 在 parse_args 里就拒绝缺 -p 的调用，
+    # 分支里不再需要校验代码
+    parser.add_argument('-p', '--progress-doc', type=str, required=True,
+                        help='指定进度文档路径（监控模式必需）')
+    args = parser.parse_args(argv)
+
+    # 校验通过就 execv 进一个精简进程再跑监控：解析器、帮助文本这些
+    # CLI 脚手架不值得陪长驻进程待 24 小时，子进程完全不导入 argparse
+    bootstrap = (
+        "import sys; sys.path.insert(0, sys.argv[1]); "
+        "import task_manager as tm; "
+        "tm._monitor_bootstrap(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), "
+        "sys.argv[5] == '1')"
+    )
+    os.execv(sys.executable, [
+        sys.executable, '-c', bootstrap,
+        _MODULE_DIR, args.progress_doc, str(args.interval), str(args.concurrency),
+        '1' if args.watch else '0',
+    ])
+
+
+def _monitor_bootstrap(progress_doc, interval, concurrency, watch=False):
+    """execv 之后的最小监控入口，不经过任何参数解析"""
+    import asyncio
+    asyncio.run(_monitor_async(
+        TaskExecutor(), interval, concurrency, progress_doc, watch=watch))
+
+
+def _wait_for_change(path, timeout):
+    """阻塞等待文件被写入/改名，最多等 timeout 秒
+
+    macOS/BSD 上走 kqueue 的 EVFILT_VNODE，没变化时零 CPU，
+    有变化立即醒；kqueue 不可用时退化为 1 秒粒度的 mtime 轮询
+    """
+    import select
+
+    if hasattr(select, 'kqueue'):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            time.sleep(timeout)
+            return
+        kq = select.kqueue()
+        try:
+            ev = select.kevent(
+                fd,
+                filter=select.KQ_FILTER_VNODE,
+                flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                fflags=(select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND
+                        | select.KQ_NOTE_RENAME | select.KQ_NOTE_DELETE))
+            kq.control([ev], 0, 0)
+            kq.control(None, 1, timeout)
+        finally:
+            kq.close()
+            os.close(fd)
+        return
+
+    try:
+        baseline = os.stat(path).st_mtime_ns
+    except OSError:
+        baseline = None
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        time.sleep(min(1.0, max(0.0, deadline - time.time())))
+        try:
+            current = os.stat(path).st_mtime_ns
+        except OSError:
+            current = None
+        if current != baseline:
+            return
+
+
+async def _monitor_async(executor, interval, max_concurrent, progress_doc,
+                         max_duration=24 * 60 * 60, watch=False):
+    """asyncio 版监控循环
+
+    任务扫描是阻塞 I/O（子进程、AppleScript、文件读写），丢进默认
+    线程池执行，休眠走 asyncio.sleep，事件循环全程保持可响应。
+
+    注意：扫描入口会先 killpg 清理上一个任务的进程组，且 executor
+    （ClaudeCodeManager 的窗口ID/进程组状态）没有加锁，扫描并不可
+    重入——同一时刻只保留一个在飞的扫描，上一轮没结束就跳过本轮
+    派发；max_concurrent 在扫描真正可重入之前一律按 1 处理
+    """
+    import asyncio
+
+    logger.info("=" * 60)
+    logger.info("启动 24 小时监控模式 (asyncio)")
+    logger.info(f"检查间隔: {interval} 秒 ({interval / 60:.1f} 分钟)")
+    if max_concurrent > 1:
+        # 默认值就是 1，走到这里必然是显式传了 -c
+        logger.warning(
+            "任务扫描不可重入（会清理上一任务的进程组），"
+            "并发上限按 1 处理（请求值: %d）", max_concurrent)
+    logger.info(f"最大运行时间: {max_duration} 秒 ({max_duration / 3600:.1f} 小时)")
+    logger.info("=" * 60)
+
+    loop = asyncio.get_running_loop()
+    current = None
+
+    def _log_scan_error(task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"扫描任务出错: {task.exception()}")
+
+    start_time = time.time()
+    loop_count = 0
+
+    try:
+        while True:
+            loop_count += 1
+            elapsed = time.time() - start_time
+
+            logger.info(f"\n[循环 #{loop_count}] 已运行: {elapsed / 60:.1f} 分钟")
+
+            if current is None or current.done():
+                current = asyncio.ensure_future(loop.run_in_executor(
+                    None, executor.scan_and_execute_tasks, progress_doc))
+                current.add_done_callback(_log_scan_error)
+            else:
+                logger.warning(f"[循环 #{loop_count}] 上一轮扫描仍在执行，跳过本轮派发")
+
+            if elapsed > max_duration:
+                logger.warning(f"已运行 {max_duration / 3600:.1f} 小时，停止监控")
+                break
+
+            # 与同步版一致：按绝对截止时刻对齐，派发耗时不拖慢节拍
+            next_deadline = start_time + loop_count * interval
+            remaining = next_deadline - time.time()
+            if remaining > 0:
+                if watch:
+                    # 事件驱动：进度文档一变就醒，interval 只是延迟上限
+                    logger.info(f"等待进度文档变化（最多 {remaining:.0f} 秒）...")
+                    await loop.run_in_executor(
+                        None, _wait_for_change, progress_doc, remaining)
+                else:
+                    logger.info(f"将在 {remaining:.0f} 秒后进行下一次检查...")
+                    await asyncio.sleep(remaining)
+            else:
+                logger.warning(f"本轮派发超出检查间隔 {-remaining:.0f} 秒，立即开始下一轮")
+    except KeyboardInterrupt:
+        logger.info("监控被中断")
+    except Exception as e:
+        logger.error(f"监控出错: {e}")
+    finally:
+        if current is not None and not current.done():
+            await asyncio.gather(current, return_exceptions=True)
+        logger.info("监控已停止")
+
+
+def _execute_main(argv):
+    """--execute 模式：只构造执行相关的参数"""
+    argparse = _import_argparse()
+
+    parser = argparse.ArgumentParser(description='单次执行所有待处理任务')
+    parser.add_argument('-e', '--execute', action='store_true',
+                        help='单次执行所有待处理任务')
+    parser.add_argument('-p', '--progress-doc', type=str, required=True,
+                        help='指定进度文档路径（执行模式必需）')
+    parser.add_argument('-t', '--task-num', type=str, default=None,
+                        help='指定任务编号（可选，如果指定则直接执行该任务）')
+    args = parser.parse_args(argv)
+
+    logger.info("启动单次执行模式")
+    executor = TaskExecutor()
+    executor.scan_and_execute_tasks(progress_doc=args.progress_doc, task_num=args.task_num)
+    logger.info("执行完成")
+
+
+def main():
+    """主程序入口：先看一眼首个参数再决定建哪套解析器
+
+    各模式只构造自己用得到的 argparse 动作（懒构造），--status 这类
+    轻调用不付完整解析器的构造成本；认不出来的输入回退到完整解析器
+    """
+    argv = sys.argv[1:]
+    # 无参数和求助路径直接写静态帮助，绕开 argparse
+    if not argv or argv[0] in ('-h', '--help'):
+        sys.stdout.write(STATIC_HELP)
+        return
+    mode = argv[0]
+    if mode == '--daemon':
+        _daemon_main()
+        return
+    if mode == '--client':
+        _client_main(argv[1:])
+        return
+    if mode in ('-s', '--status') and len(argv) == 1:
+        _status_main()
+        return
+    if mode in ('-m', '--monitor'):
+        _monitor_main(argv[1:])
+        return
+    if mode in ('-e', '--execute'):
+        _execute_main(argv[1:])
+        return
+    _full_main()
+
+
+# 帮助尾注在模块作用域渲染一次，parser 每次复用同一个字符串对象
+_EPILOG = """
 示例:
   # 启动 24 小时监控模式
   python task_manager.py --monitor
-  
+
   # 单次执行所有待处理任务
   python task_manager.py --execute
-  
+
   # 显示任务状态
   python task_manager.py --status
-  
+
   # 显示帮助
   python task_manager.py --help
-        """
+"""
+
+_FULL_PARSER = None
+
+
+def _build_parser():
+    """按需构造完整解析器，并作为模块级单例复用
+
+    守护进程和测试里 main() 会被反复调用，缓存住 parser 省去每次
+    重建全部 Action 对象和帮助文本
+    """
+    global _FULL_PARSER
+    if _FULL_PARSER is not None:
+        return _FULL_PARSER
+    argparse = _import_argparse()
+    
+    parser = argparse.ArgumentParser(
+        description='Cursor 24小时自动化任务执行管理器',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=_EPILOG
     )
     
     parser.add_argument(
@@ -916,6 +1561,19 @@ def main():
         help='监控间隔（秒），默认 900（15分钟）'
     )
     
+    parser.add_argument(
+        '-c', '--concurrency',
+        type=int,
+        default=1,
+        help='同时派发的任务扫描数上限，默认 1（扫描暂不可重入，大于 1 的值按 1 处理）'
+    )
+    
+    parser.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        help='进度文档变化即触发检查，--interval 作为延迟上限'
+    )
+    
     parser.add_argument(
         '-p', '--progress-doc',
         type=str,
@@ -930,34 +1588,45 @@ def main():
         help='指定任务编号（可选，如果指定则直接执行该任务）'
     )
     
-    args = parser.parse_args()
-    
+    # -h 出现在非首位时会走到这里：帮助同样返回预渲染文本，
+    # 不进 HelpFormatter 的动作遍历和终端宽度探测
+    parser.format_help = lambda: STATIC_HELP
+
+    _FULL_PARSER = parser
+    return parser
+
+
+def _run_once(args):
+    """--execute 与默认分支共用的单次执行路径"""
+    if not args.progress_doc:
+        _build_parser().error("执行模式需要指定进度文档路径，使用 -p 参数")
+    logger.info("启动单次执行模式")
     executor = TaskExecutor()
-    
+    executor.scan_and_execute_tasks(progress_doc=args.progress_doc, task_num=args.task_num)
+    logger.info("执行完成")
+
+
+def _full_main():
+    """完整解析器路径：处理帮助、默认执行和组合参数"""
+    parser = _build_parser()
+    args = parser.parse_args()
+
+    # TaskExecutor 的构造要读 state.json，推迟到参数校验通过、
+    # 确定要干活的分支里再建，坏参数路径不碰文件系统
     if args.monitor:
         # 监控模式需要进度文档
         if not args.progress_doc:
-            logger.error("监控模式需要指定进度文档路径，使用 -p 参数")
-            sys.exit(1)
-        executor.monitor_loop(interval=args.interval)
-    elif args.execute:
-        # 执行模式需要进度文档
-        if not args.progress_doc:
-            logger.error("执行模式需要指定进度文档路径，使用 -p 参数")
-            sys.exit(1)
-        logger.info("启动单次执行模式")
-        executor.scan_and_execute_tasks(progress_doc=args.progress_doc, task_num=args.task_num)
-        logger.info("执行完成")
+            parser.error("监控模式需要指定进度文档路径，使用 -p 参数")
+        executor = TaskExecutor()
+        import asyncio
+        asyncio.run(_monitor_async(
+            executor, args.interval, args.concurrency, args.progress_doc,
+            watch=args.watch))
     elif args.status:
-        executor.show_status()
+        TaskExecutor().show_status()
     else:
-        # 默认行为：单次执行
-        if not args.progress_doc:
-            logger.error("执行模式需要指定进度文档路径，使用 -p 参数")
-            sys.exit(1)
-        logger.info("启动单次执行模式（默认）")
-        executor.scan_and_execute_tasks(progress_doc=args.progress_doc, task_num=args.task_num)
-        logger.info("执行完成")
+        # --execute 和默认行为都是单次执行，收敛到同一条路径
+        _run_once(args)
 
 if __name__ == '__main__':
     main()